@@ -5,12 +5,23 @@ import shutil
 import tempfile
 import uuid
 
-from ..services.engine_manager import ALLOWED_EXTENSIONS, get_engine_manager
+from ..services.engine_manager import ALLOWED_EXTENSIONS, DOCUMENT_EXTENSIONS, get_engine_manager
 
 router = APIRouter()
 job_statuses: Dict[str, str] = {}
+# Per-file results (rows loaded, rows/sec) for each job, alongside its status.
+job_details: Dict[str, Dict] = {}
 
 MAX_FILE_SIZE_BYTES = 20 * 1024 * 1024  # 20MB per file
+# CSVs are bulk-loaded in fixed-size chunks, so their size is bounded by
+# disk rather than memory.
+MAX_CSV_SIZE_BYTES = int(os.getenv("MAX_CSV_SIZE_MB", "2048")) * 1024 * 1024
+# XLSX worksheets are streamed row by row; legacy .xls workbooks are still
+# read whole and stay under MAX_FILE_SIZE_BYTES.
+MAX_XLSX_SIZE_BYTES = int(os.getenv("MAX_XLSX_SIZE_MB", "500")) * 1024 * 1024
+# Documents are extracted and embedded as a stream with bounded memory, so
+# they can be much larger than spreadsheets.
+MAX_DOCUMENT_SIZE_BYTES = int(os.getenv("MAX_DOCUMENT_SIZE_MB", "200")) * 1024 * 1024
 
 
 @router.post("/upload-documents")
@@ -47,13 +58,22 @@ async def upload_documents(background_tasks: BackgroundTasks, files: List[Upload
                 )
 
             file_path = os.path.join(upload_dir, safe_name)
+            if extension in DOCUMENT_EXTENSIONS:
+                max_size = MAX_DOCUMENT_SIZE_BYTES
+            elif extension == ".csv":
+                max_size = MAX_CSV_SIZE_BYTES
+            elif extension == ".xlsx":
+                max_size = MAX_XLSX_SIZE_BYTES
+            else:
+                max_size = MAX_FILE_SIZE_BYTES
             size = 0
             with open(file_path, "wb") as buffer:
                 while chunk := await file.read(1024 * 1024):
                     size += len(chunk)
-                    if size > MAX_FILE_SIZE_BYTES:
+                    if size > max_size:
                         raise HTTPException(
-                            status_code=400, detail=f"File '{safe_name}' exceeds the 20MB limit."
+                            status_code=400,
+                            detail=f"File '{safe_name}' exceeds the {max_size // (1024 * 1024)}MB limit.",
                         )
                     buffer.write(chunk)
             file_paths.append(file_path)
@@ -64,7 +84,7 @@ async def upload_documents(background_tasks: BackgroundTasks, files: List[Upload
         shutil.rmtree(upload_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Failed to save uploaded files: {e}")
 
-    background_tasks.add_task(manager.process_uploaded_batch, file_paths, job_id, job_statuses)
+    background_tasks.add_task(manager.process_uploaded_batch, file_paths, job_id, job_statuses, job_details)
 
     return {"message": "Upload successful, processing started.", "job_id": job_id}
 
@@ -74,4 +94,20 @@ async def get_ingestion_status(job_id: str):
     status = job_statuses.get(job_id)
     if not status:
         raise HTTPException(status_code=404, detail="Job ID not found.")
-    return {"job_id": job_id, "status": status}
+    details = job_details.get(job_id, {})
+    if status == "In Progress" and details.get("files"):
+        status = f"In Progress ({_progress_summary(details['files'])})"
+    return {"job_id": job_id, "status": status, **details}
+
+
+def _progress_summary(files: Dict[str, Dict]) -> str:
+    """One-line progress across the files of a job, e.g. "1/3 files done, 120,000 rows, 42 chunks"."""
+    done = sum(1 for f in files.values() if f.get("status") != "In Progress")
+    parts = [f"{done}/{len(files)} files done"]
+    rows = sum(f.get("rows", 0) for f in files.values())
+    chunks = sum(f.get("chunks", 0) for f in files.values())
+    if rows:
+        parts.append(f"{rows:,} rows")
+    if chunks:
+        parts.append(f"{chunks:,} chunks")
+    return ", ".join(parts)
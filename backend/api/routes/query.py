@@ -1,33 +1,112 @@
+from typing import Any, Dict
+
 from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi.responses import StreamingResponse
 
 from ..services.engine_manager import get_engine_manager
+from ..services.query_engine import InvalidSQLError, ResultExpiredError
+from ..services.serialization import FastJSONResponse, dumps
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 10000
+
 
 @router.post("/query")
-async def process_query(payload: Dict[str, str]):
+async def process_query(payload: Dict[str, Any]):
     """
     Processes a natural language query against whichever data source is
     currently active (PostgreSQL, uploaded files, or the demo dataset).
+    Pass ``page_size`` to get the SQL results one page at a time, then
+    send back the returned ``next_page_token`` (with the same query) for
+    the next page. Pass ``"format": "columnar"`` to get SQL results as
+    {"columns": [...], "data": [[column values], ...]} instead of one
+    object per row, which is much smaller and faster for big results.
     """
-    user_query = (payload.get("query") or "").strip()
-    if not user_query:
+    user_query = str(payload.get("query") or "").strip()
+    page_token = payload.get("page_token")
+    if not user_query and not page_token:
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
-    manager = get_engine_manager()
-    if manager.engine is None:
-        raise HTTPException(
-            status_code=503,
-            detail="No data source is active yet. Connect a database, upload files, or use the demo dataset first.",
-        )
+    page_size = payload.get("page_size")
+    if page_size is not None or page_token is not None:
+        try:
+            page_size = int(page_size if page_size is not None else 100)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="page_size must be an integer.")
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {MAX_PAGE_SIZE}.")
+
+    result_format = payload.get("format", "rows")
+    if result_format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail='format must be "rows" or "columnar".')
+    columnar = result_format == "columnar"
+
+    manager = _require_engine()
+    try:
+        if page_size is not None:
+            response = await manager.engine.process_query_page(user_query, page_size, page_token, columnar)
+        else:
+            response = await manager.engine.process_query(user_query, columnar)
+    except ResultExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+    return FastJSONResponse(response)
+
+
+@router.post("/query/stream")
+async def stream_query(payload: Dict[str, Any]):
+    """
+    Like /query, but streams the answer as NDJSON: a {"meta": ...} line,
+    one {"row": ...} line per SQL result row as it comes off a
+    server-side cursor, a {"documents": [...]} line for document matches,
+    and a closing {"end": {"row_count": n}} line (or {"error": ...} if the
+    query fails midway). Nothing is buffered beyond one cursor batch.
+    """
+    user_query = str(payload.get("query") or "").strip()
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
+    manager = _require_engine()
     try:
-        return manager.engine.process_query(user_query)
+        metadata, row_batches, documents = await manager.engine.prepare_stream(user_query)
+    except InvalidSQLError as e:
+        # Show the rejected SQL, as /query does.
+        lines = [_ndjson_line({"meta": {"generated_sql": e.sql}}), _ndjson_line({"error": str(e)})]
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
+    def ndjson():
+        yield _ndjson_line({"meta": metadata})
+        row_limit = metadata.get("row_limit")
+        row_count = 0
+        truncated = False
+        try:
+            for batch in row_batches or ():
+                if row_limit is not None and row_count + len(batch) > row_limit:
+                    batch, truncated = batch[: row_limit - row_count], True
+                row_count += len(batch)
+                yield b"".join(_ndjson_line({"row": row}) for row in batch)
+                if truncated:
+                    break
+        except Exception as e:
+            yield _ndjson_line({"error": str(e)})
+            return
+        finally:
+            # Closing the generator releases the cursor's connection even
+            # when we stop early.
+            if row_batches is not None:
+                row_batches.close()
+        if documents:
+            yield _ndjson_line({"documents": documents})
+        yield _ndjson_line({"end": {"row_count": row_count, "truncated": truncated}})
+
+    # A plain generator: Starlette iterates it on a worker thread, so the
+    # blocking cursor reads stay off the event loop.
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 
 @router.get("/query/history")
 async def get_query_history():
@@ -36,3 +115,23 @@ async def get_query_history():
     if manager.engine is None:
         return {"history": []}
     return {"history": manager.engine.get_history()}
+
+
+@router.get("/query/cache-stats")
+async def get_cache_stats():
+    """Returns entries, bytes and hit/miss/eviction counters for the query caches."""
+    return get_engine_manager().cache_stats()
+
+
+def _require_engine():
+    manager = get_engine_manager()
+    if manager.engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="No data source is active yet. Connect a database, upload files, or use the demo dataset first.",
+        )
+    return manager
+
+
+def _ndjson_line(value: Any) -> bytes:
+    return dumps(value) + b"\n"
@@ -1,5 +1,25 @@
+import asyncio
+import os
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+
+# Database drivers (psycopg2, sqlite3) are blocking, so async callers run
+# execute() on this shared pool instead of on the event loop. Sized a bit
+# above the Postgres connection pool so a burst of queries queues on
+# connections rather than on threads.
+SQL_EXECUTOR_THREADS = int(os.getenv("SQL_EXECUTOR_THREADS", "16"))
+_sql_executor = ThreadPoolExecutor(max_workers=SQL_EXECUTOR_THREADS, thread_name_prefix="sql-exec")
+# Longest any single query may run before the database cancels it, so a
+# runaway generated query can't hold a pooled connection or a CPU core.
+STATEMENT_TIMEOUT_SECONDS = float(os.getenv("STATEMENT_TIMEOUT_SECONDS", "30"))
+# Rows fetched per round trip when streaming a result.
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "1000"))
+# Longest a streamed result may hold its cursor, counting the time the
+# client takes to read it; a slow or stalled reader can't pin a pooled
+# connection past this.
+STREAM_TIMEOUT_SECONDS = float(os.getenv("STREAM_TIMEOUT_SECONDS", "120"))
 
 
 class BaseSQLDataSource(ABC):
@@ -13,6 +33,14 @@ class BaseSQLDataSource(ABC):
     #: SQL dialect hint passed to the LLM prompt (e.g. "postgresql", "sqlite").
     dialect: str = "sql"
 
+    #: Bumped whenever the data behind this source changes (e.g. a new
+    #: upload), so cached query results can be recognised as stale.
+    version: int = 0
+
+    #: True when every change to the data goes through this app (and so
+    #: bumps ``version``); otherwise cached results can only expire by TTL.
+    tracks_changes: bool = False
+
     @abstractmethod
     def get_schema(self) -> Dict:
         """Return {"tables": [{"name", "columns": [...], "foreign_keys": [...]}]}"""
@@ -23,6 +51,99 @@ class BaseSQLDataSource(ABC):
         """Execute a read-only SQL query and return rows as a list of dicts."""
         raise NotImplementedError
 
+    @abstractmethod
+    def iter_rows(self, sql: str, batch_size: int = STREAM_BATCH_ROWS) -> Iterator[List[Dict]]:
+        """
+        Execute a read-only SQL query through a server-side cursor and
+        yield its rows in batches of dicts, so the full result is never
+        held in memory at once.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def execute_columnar(self, sql: str) -> Dict:
+        """
+        Execute a read-only SQL query and return its result column-wise:
+        {"columns": [names], "data": [[values of column 0], ...]}.
+        """
+        raise NotImplementedError
+
+    async def execute_async(self, sql: str) -> List[Dict]:
+        """Runs execute() on the SQL worker pool so it never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_sql_executor, self.execute, sql)
+
+    async def execute_columnar_async(self, sql: str) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_sql_executor, self.execute_columnar, sql)
+
+    def record_query(self, sql: str):
+        """
+        Called with each generated query after it ran successfully, so a
+        source can adapt to its workload (see SQLiteUploadDataSource).
+        Must return quickly. No-op by default.
+        """
+
     def describe(self) -> str:
         """Human-readable label shown in the UI (e.g. "Demo Database")."""
         return "SQL Data Source"
+
+
+class StreamDeadline:
+    """
+    Wraps row batches from iter_rows with an overall deadline. When it
+    passes, the underlying generator is closed (releasing its cursor and
+    connection) even if the consumer is stalled between batches, and the
+    next read raises TimeoutError. A fetch already in progress is left to
+    the per-statement timeout and the stream ends right after it.
+    """
+
+    def __init__(self, batches: Iterator[List[Dict]], seconds: float = STREAM_TIMEOUT_SECONDS):
+        self.seconds = seconds
+        self._batches = batches
+        self._lock = threading.Lock()
+        self._expired = False
+        self._timer = threading.Timer(seconds, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[Dict]:
+        with self._lock:
+            if not self._expired:
+                try:
+                    batch = next(self._batches)
+                except StopIteration:
+                    self._timer.cancel()
+                    raise
+                if not self._expired:
+                    return batch
+            self._batches.close()
+        raise TimeoutError(f"Streaming the result took longer than {self.seconds:g}s and was stopped.")
+
+    def close(self):
+        self._timer.cancel()
+        with self._lock:
+            self._batches.close()
+
+    def _expire(self):
+        self._expired = True
+        # Not acquiring means a fetch is running; __next__ closes after it.
+        if self._lock.acquire(blocking=False):
+            try:
+                self._batches.close()
+            finally:
+                self._lock.release()
+
+
+def columnar_result(result_proxy) -> Dict:
+    """
+    Transposes a cursor's row tuples straight into per-column lists, with
+    no dict per row and the column names sent once.
+    """
+    columns = list(result_proxy.keys())
+    rows = result_proxy.fetchall()
+    data = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+    return {"columns": columns, "data": data}
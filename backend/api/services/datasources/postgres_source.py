@@ -1,9 +1,9 @@
-from typing import List, Dict
+from typing import Dict, Iterator, List
 
 from sqlalchemy import create_engine, text
 
 from ..schema_discovery import SchemaDiscovery
-from .base import BaseSQLDataSource
+from .base import STATEMENT_TIMEOUT_SECONDS, STREAM_BATCH_ROWS, BaseSQLDataSource, columnar_result
 
 
 class PostgresDataSource(BaseSQLDataSource):
@@ -17,7 +17,12 @@ class PostgresDataSource(BaseSQLDataSource):
         # with a friendly message if it's unreachable/invalid.
         self._schema = SchemaDiscovery().analyze_database(connection_string)
         self._engine = create_engine(
-            connection_string, pool_size=5, max_overflow=2, pool_pre_ping=True
+            connection_string,
+            pool_size=5,
+            max_overflow=2,
+            pool_pre_ping=True,
+            # Postgres cancels any statement that runs past the budget.
+            connect_args={"options": f"-c statement_timeout={int(STATEMENT_TIMEOUT_SECONDS * 1000)}"},
         )
 
     def get_schema(self) -> Dict:
@@ -28,5 +33,15 @@ class PostgresDataSource(BaseSQLDataSource):
             result_proxy = connection.execute(text(sql))
             return [dict(row._mapping) for row in result_proxy]
 
+    def execute_columnar(self, sql: str) -> Dict:
+        with self._engine.connect() as connection:
+            return columnar_result(connection.execute(text(sql)))
+
+    def iter_rows(self, sql: str, batch_size: int = STREAM_BATCH_ROWS) -> Iterator[List[Dict]]:
+        with self._engine.connect() as connection:
+            result_proxy = connection.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql))
+            for partition in result_proxy.partitions(batch_size):
+                yield [dict(row._mapping) for row in partition]
+
     def describe(self) -> str:
         return "PostgreSQL Database"
@@ -1,9 +1,55 @@
-from typing import List, Dict
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
 
+from ..host_memory import memory_limit_bytes
 from ..schema_discovery import SchemaDiscovery
-from .base import BaseSQLDataSource
+from .base import STATEMENT_TIMEOUT_SECONDS, STREAM_BATCH_ROWS, BaseSQLDataSource, columnar_result
+
+# How many SQLite VM instructions run between deadline checks; small
+# enough to react within milliseconds, large enough to cost nothing.
+PROGRESS_HANDLER_INSTRUCTIONS = 10000
+
+# Each read connection maps up to this much of the file instead of
+# copying pages through read() calls, and keeps its own page cache.
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_MB", "32")) * 1024
+# Share of the host's (or container's) memory the page caches of all read
+# pools may take by default; the demo and upload databases each have one.
+SQLITE_READ_MEMORY_SHARE = 0.125
+SQLITE_READ_POOLS = 2
+
+
+def _default_read_pool_size() -> int:
+    """Up to 8 connections, as many as the memory share allows, but at least 2."""
+    memory = memory_limit_bytes()
+    if memory is None:
+        return 8
+    per_pool = memory * SQLITE_READ_MEMORY_SHARE / SQLITE_READ_POOLS
+    return max(2, min(8, int(per_pool // (SQLITE_CACHE_KIB * 1024))))
+
+
+# Pooled read-only connections per database. Queries run on the shared
+# SQL executor, so this bounds how many of them read at once.
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", str(_default_read_pool_size())))
+# How long a writer waits for another writer before giving up.
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# temp_store stays at its default (files), so the sort and GROUP BY
+# scratch space of a big generated query spills to disk, not to RAM.
+READ_PRAGMAS = (
+    f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}",
+)
+WRITE_PRAGMAS = (
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous=NORMAL",
+)
 
 
 class SQLiteDataSource(BaseSQLDataSource):
@@ -15,21 +61,95 @@ class SQLiteDataSource(BaseSQLDataSource):
     """
 
     dialect = "sqlite"
+    # The SQLite files are private to this app, so nothing else writes them.
+    tracks_changes = True
 
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self.connection_string = f"sqlite:///{db_path}"
+        # Loads and schema changes go through the write engine. Switching
+        # the file to WAL here (the setting is stored in the file) lets
+        # queries keep reading the last committed data while a load writes.
+        self._write_engine = create_engine(
+            f"sqlite:///{db_path}", connect_args={"check_same_thread": False}
+        )
+        _run_on_connect(self._write_engine, WRITE_PRAGMAS)
+        with self._write_engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+        # Queries get their own pool of read-only connections, so generated
+        # SQL can never modify the data and readers never take a write lock.
+        self.connection_string = f"sqlite:///file:{db_path}?mode=ro&uri=true"
         self._engine = create_engine(
-            self.connection_string, connect_args={"check_same_thread": False}
+            self.connection_string,
+            connect_args={"check_same_thread": False},
+            pool_size=SQLITE_READ_POOL_SIZE,
+            max_overflow=0,
         )
+        _run_on_connect(self._engine, READ_PRAGMAS)
 
     def get_schema(self) -> Dict:
         return SchemaDiscovery().analyze_database(self.connection_string)
 
     def execute(self, sql: str) -> List[Dict]:
-        with self._engine.connect() as connection:
+        with self._timed_connection() as (connection, _):
             result_proxy = connection.execute(text(sql))
             return [dict(row._mapping) for row in result_proxy]
 
+    def execute_columnar(self, sql: str) -> Dict:
+        with self._timed_connection() as (connection, _):
+            return columnar_result(connection.execute(text(sql)))
+
+    def iter_rows(self, sql: str, batch_size: int = STREAM_BATCH_ROWS) -> Iterator[List[Dict]]:
+        # Like Postgres' statement_timeout on a server-side cursor, the
+        # budget applies to each fetch; the whole (client-paced) stream is
+        # bounded by StreamDeadline.
+        with self._timed_connection() as (connection, restart_clock):
+            result_proxy = connection.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql))
+            for partition in result_proxy.partitions(batch_size):
+                yield [dict(row._mapping) for row in partition]
+                restart_clock()
+
+    @contextmanager
+    def _timed_connection(self):
+        """
+        A connection whose statements are interrupted once they run past
+        STATEMENT_TIMEOUT_SECONDS. SQLite has no statement timeout, so a
+        progress handler checks the clock while the query executes and
+        aborts it. Only query connections get it, never loads.
+        """
+        deadline = [0.0]
+
+        def restart_clock():
+            deadline[0] = time.monotonic() + STATEMENT_TIMEOUT_SECONDS
+
+        def past_deadline() -> int:
+            return 1 if time.monotonic() > deadline[0] else 0
+
+        restart_clock()
+        with self._engine.connect() as connection:
+            raw_connection = connection.connection.driver_connection
+            raw_connection.set_progress_handler(past_deadline, PROGRESS_HANDLER_INSTRUCTIONS)
+            try:
+                yield connection, restart_clock
+            except OperationalError as e:
+                if isinstance(e.orig, sqlite3.OperationalError) and "interrupted" in str(e.orig):
+                    raise TimeoutError(
+                        f"Query took longer than {STATEMENT_TIMEOUT_SECONDS:g}s and was cancelled."
+                    ) from None
+                raise
+            finally:
+                raw_connection.set_progress_handler(None, 0)
+
     def describe(self) -> str:
         return "SQLite Database"
+
+
+def _run_on_connect(engine, pragmas):
+    """Applies per-connection PRAGMAs to every connection the engine's pool opens."""
+
+    @event.listens_for(engine, "connect")
+    def apply(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -1,13 +1,43 @@
+import itertools
 import os
+import queue
 import re
 import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pandas as pd
+from openpyxl import load_workbook
 
+from ..index_advisor import INDEX_MIN_ROWS, IndexAdvisor, id_like_columns, index_name
 from .sqlite_source import SQLiteDataSource
 
+# Rows parsed and inserted per step; bounds loader memory regardless of
+# file size.
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+
+# Worksheet rows read into each batch when streaming an XLSX workbook.
+XLSX_BATCH_ROWS = int(os.getenv("XLSX_BATCH_ROWS", "20000"))
+
+# Structured files parsed at once; pandas' C parser releases the GIL for
+# much of its work, so threads overlap well.
+STRUCTURED_PARSE_WORKERS = int(os.getenv("STRUCTURED_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Applied to the write connection for the duration of a load. The upload
+# database is a private scratch file that can be rebuilt by uploading
+# again, so durability is traded for speed while loading. The connection
+# is discarded afterwards rather than returned to the pool, so the page
+# cache and in-memory temp storage are freed with it.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-65536",  # 64MB page cache
+    "PRAGMA temp_store=MEMORY",
+)
+
 
 class SQLiteUploadDataSource(SQLiteDataSource):
     """
@@ -21,6 +51,13 @@ class SQLiteUploadDataSource(SQLiteDataSource):
         db_path = os.path.join(tempfile.gettempdir(), f"nlp-query-engine-uploads-{uuid.uuid4().hex}.db")
         super().__init__(db_path)
         self._table_names = set()
+        # Names claimed by loads still in progress.
+        self._reserved_names = set()
+        self._names_lock = threading.Lock()
+        # Held by loads, resets and index builds, so index builds never
+        # compete with a load's writer for SQLite's write lock.
+        self._write_lock = threading.Lock()
+        self.index_advisor = IndexAdvisor(self, self._engine)
 
     def has_tables(self) -> bool:
         return bool(self._table_names)
@@ -30,48 +67,171 @@ class SQLiteUploadDataSource(SQLiteDataSource):
 
     def reset(self):
         """Drops every table so a fresh upload session can start clean."""
-        with self._engine.begin() as connection:
+        with self._write_lock, self._write_engine.begin() as connection:
             for table_name in list(self._table_names):
                 connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table_name}"')
         self._table_names.clear()
+        self.version += 1
+        self.index_advisor.reset()
+
+    def record_query(self, sql: str):
+        self.index_advisor.record(sql)
 
-    def load_file(self, path: str) -> list:
-        """Loads a CSV or XLSX file into one or more tables. Returns the list of table names created."""
-        extension = Path(path).suffix.lower()
+    def create_index(self, table_name: str, column: str) -> Optional[str]:
+        """
+        Indexes one column of an uploaded table (used by the index
+        advisor). Waits for any load in progress. Returns the index name,
+        or None if the table no longer exists.
+        """
+        name = index_name(table_name, column)
+        with self._write_lock:
+            if table_name not in self._table_names:
+                return None
+            with self._write_engine.begin() as connection:
+                connection.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ("{column}")')
+        return name
+
+    def load_file(self, path: str) -> List[Dict]:
+        """
+        Loads a CSV or XLSX file into one or more tables. Returns one
+        {"table", "rows", "seconds", "rows_per_second"} entry per table created.
+        """
+        result = self.load_files([path])[path]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def load_files(self, paths: List[str], progress: Optional[Dict[str, Dict]] = None) -> Dict[str, object]:
+        """
+        Loads several CSV/XLSX files at once. Files are parsed in parallel
+        (STRUCTURED_PARSE_WORKERS at a time) while a single writer thread
+        owns the only write connection and inserts chunks in the order
+        they arrive, so parsers never contend for SQLite's write lock.
+        Returns {path: list of table results, or the Exception that file
+        failed with}. If given, ``progress`` is updated live with one
+        entry per file name (status, rows, rows_per_second).
+        """
+        if progress is None:
+            progress = {}
+        workers = max(1, min(STRUCTURED_PARSE_WORKERS, len(paths)))
+        with self._write_lock:
+            writer = _SerialWriter(self._write_engine, queue_size=2 * workers)
+            try:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse") as pool:
+                    futures = {path: pool.submit(self._load_one, path, writer, progress) for path in paths}
+                results: Dict[str, object] = {}
+                for path, future in futures.items():
+                    try:
+                        results[path] = future.result()
+                    except Exception as e:
+                        results[path] = e
+            finally:
+                writer.close()
+        return results
+
+    def _load_one(self, path: str, writer: "_SerialWriter", progress: Dict[str, Dict]) -> List[Dict]:
+        file_progress = progress.setdefault(os.path.basename(path), {})
+        file_progress.update({"status": "In Progress", "rows": 0, "rows_per_second": 0})
+        started = time.perf_counter()
         created = []
-        if extension == ".csv":
-            df = pd.read_csv(path)
-            table_name = self._unique_table_name(Path(path).stem)
-            self._write_table(table_name, df)
-            created.append(table_name)
-        elif extension in (".xlsx", ".xls"):
-            sheets = pd.read_excel(path, sheet_name=None)
-            for sheet_name, df in sheets.items():
-                if df is None or df.empty:
-                    continue
-                table_name = self._unique_table_name(sheet_name)
-                self._write_table(table_name, df)
-                created.append(table_name)
-        else:
-            raise ValueError(f"Unsupported structured file type: {extension}")
-
-        if not created:
-            raise ValueError(f"No data found in '{os.path.basename(path)}'.")
+        try:
+            for raw_table_name, chunks in _parse_structured_file(path):
+                table_name = self._reserve_table_name(raw_table_name)
+                try:
+                    created.append(self._load_table(table_name, chunks, writer, file_progress, started))
+                finally:
+                    with self._names_lock:
+                        self._reserved_names.discard(table_name)
+            if not created:
+                raise ValueError(f"No data found in '{os.path.basename(path)}'.")
+        except Exception as e:
+            file_progress["status"] = f"Failed: {e}"
+            raise
+        file_progress.update({"status": "Complete", "tables": [t["table"] for t in created]})
         return created
 
-    def _write_table(self, table_name: str, df: pd.DataFrame):
-        df = df.copy()
-        df.columns = [self._sanitize_identifier(str(col)) for col in df.columns]
-        # Pandas infers per-column dtypes for us; to_sql maps them to
-        # native SQLite column types automatically.
-        df.to_sql(table_name, self._engine, if_exists="replace", index=False)
-        self._table_names.add(table_name)
+    def _load_table(
+        self,
+        table_name: str,
+        chunks: Iterable[pd.DataFrame],
+        writer: "_SerialWriter",
+        file_progress: Dict,
+        file_started: float,
+    ) -> Dict:
+        """
+        Streams DataFrame chunks into a new table through the writer: the
+        column types come from the first chunk and each chunk becomes one
+        executemany, so memory is bounded by a few chunks regardless of
+        file size and no per-row SQLAlchemy work happens. ID-like columns
+        of large tables are indexed before the table is made visible.
+        """
+        started = time.perf_counter()
+        rows = 0
+        created = False
+        id_columns: List[str] = []
+        try:
+            for chunk in chunks:
+                if not created:
+                    columns = self._unique_column_names(chunk.columns)
+                    column_defs = ", ".join(
+                        f'"{name}" {_sqlite_type(chunk[source])}' for name, source in zip(columns, chunk.columns)
+                    )
+                    writer.create_table(table_name, column_defs, len(columns))
+                    id_columns = id_like_columns(chunk, columns)
+                    created = True
+                batch = list(_chunk_rows(chunk))
+                writer.insert(table_name, batch)
+                rows += len(batch)
+                file_progress["rows"] += len(batch)
+                elapsed = time.perf_counter() - file_started
+                file_progress["rows_per_second"] = round(file_progress["rows"] / elapsed) if elapsed > 0 else 0
+            if not created:
+                raise ValueError("The file has no columns.")
+            if rows >= INDEX_MIN_ROWS:
+                for column in id_columns:
+                    writer.create_index(table_name, index_name(table_name, column), column)
+            # Wait until everything queued for this table is on disk.
+            writer.finish(table_name).result()
+        except Exception:
+            if created:
+                writer.drop(table_name)
+            raise
+
+        with self._names_lock:
+            self._table_names.add(table_name)
+            self.version += 1
+        seconds = time.perf_counter() - started
+        return {
+            "table": table_name,
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds) if seconds > 0 else rows,
+        }
+
+    def _reserve_table_name(self, raw_name: str) -> str:
+        # Files load in parallel, so picking a free name and claiming it
+        # must happen atomically.
+        with self._names_lock:
+            name = self._unique_table_name(raw_name)
+            self._reserved_names.add(name)
+            return name
+
+    def _unique_column_names(self, raw_names) -> List[str]:
+        names: List[str] = []
+        for raw_name in raw_names:
+            base = self._sanitize_identifier(str(raw_name))
+            name, counter = base, 2
+            while name in names:
+                name = f"{base}_{counter}"
+                counter += 1
+            names.append(name)
+        return names
 
     def _unique_table_name(self, raw_name: str) -> str:
         base = self._sanitize_identifier(raw_name)
         name = base
         counter = 2
-        while name in self._table_names:
+        while name in self._table_names or name in self._reserved_names:
             name = f"{base}_{counter}"
             counter += 1
         return name
@@ -87,3 +247,190 @@ class SQLiteUploadDataSource(SQLiteDataSource):
 
     def describe(self) -> str:
         return "Uploaded Files"
+
+
+class _SerialWriter:
+    """
+    The one thread allowed to write to the upload database during a
+    batch. Parser threads queue create/insert/drop requests; the writer
+    applies them in order on a single connection, committing after each
+    chunk or index. The queue is bounded, so fast parsers wait for the writer
+    instead of piling chunks up in memory. A table whose write fails is
+    dropped, its remaining requests are skipped, and the error is
+    reported through the Future returned by ``finish``.
+    """
+
+    def __init__(self, engine, queue_size: int):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        # Opened here so a connection failure surfaces to the caller
+        # instead of leaving parsers blocked on a writer that never started.
+        self._connection = engine.raw_connection()
+        try:
+            cursor = self._connection.cursor()
+            for pragma in BULK_LOAD_PRAGMAS:
+                cursor.execute(pragma)
+        except Exception:
+            self._connection.invalidate()
+            raise
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def create_table(self, table_name: str, column_defs: str, column_count: int):
+        self._queue.put(("create", table_name, (column_defs, column_count)))
+
+    def insert(self, table_name: str, rows: List[tuple]):
+        self._queue.put(("insert", table_name, rows))
+
+    def create_index(self, table_name: str, name: str, column: str):
+        self._queue.put(("index", table_name, (name, column)))
+
+    def drop(self, table_name: str):
+        self._queue.put(("drop", table_name, None))
+
+    def finish(self, table_name: str) -> Future:
+        future: Future = Future()
+        self._queue.put(("finish", table_name, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        cursor = self._connection.cursor()
+        insert_sql: Dict[str, str] = {}
+        failed: Dict[str, Exception] = {}
+        # Set if the connection itself stops working. Every table still to
+        # come then fails, but the queue keeps being drained so parsers
+        # never block on a writer that has given up.
+        broken: Optional[Exception] = None
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            kind, table_name, payload = message
+            if kind == "finish":
+                error = broken or failed.pop(table_name, None)
+                if error is not None:
+                    payload.set_exception(error)
+                else:
+                    payload.set_result(None)
+                continue
+            if broken is not None or (table_name in failed and kind != "drop"):
+                continue
+            try:
+                if kind == "create":
+                    column_defs, column_count = payload
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                    cursor.execute(f'CREATE TABLE "{table_name}" ({column_defs})')
+                    insert_sql[table_name] = (
+                        f'INSERT INTO "{table_name}" VALUES ({", ".join("?" for _ in range(column_count))})'
+                    )
+                elif kind == "insert":
+                    cursor.executemany(insert_sql[table_name], payload)
+                elif kind == "index":
+                    name, column = payload
+                    cursor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ("{column}")')
+                elif kind == "drop":
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                self._connection.commit()
+            except Exception as e:
+                failed[table_name] = e
+                try:
+                    self._connection.rollback()
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+                    self._connection.commit()
+                except Exception as fatal:
+                    broken = fatal
+        # Closes the SQLite connection instead of pooling it with the bulk
+        # load settings still applied.
+        self._connection.invalidate()
+
+
+def _parse_structured_file(path: str) -> Iterator[Tuple[str, Iterable[pd.DataFrame]]]:
+    """Yields (raw table name, DataFrame chunks) for each table a CSV/XLSX file holds."""
+    extension = Path(path).suffix.lower()
+    if extension == ".csv":
+        yield Path(path).stem, pd.read_csv(path, chunksize=CSV_CHUNK_ROWS)
+    elif extension == ".xlsx":
+        yield from _stream_xlsx(path)
+    elif extension == ".xls":
+        for sheet_name, df in pd.read_excel(path, sheet_name=None).items():
+            if df is not None and not df.empty:
+                yield sheet_name, [df]
+    else:
+        raise ValueError(f"Unsupported structured file type: {extension}")
+
+
+def _stream_xlsx(path: str) -> Iterator[Tuple[str, Iterable[pd.DataFrame]]]:
+    """
+    Streams each worksheet of an XLSX workbook with openpyxl's read-only,
+    values-only reader, which parses the sheet XML incrementally instead of
+    building the whole workbook in memory the way read_excel does. Rows are
+    handed on in XLSX_BATCH_ROWS DataFrames, so memory is bounded by the
+    batch size regardless of workbook size. As with read_excel, the first
+    row holds the column names, cells past the end of the header become
+    "Unnamed: N" columns, and empty sheets are skipped.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = (row for row in worksheet.iter_rows(values_only=True) if any(v is not None for v in row))
+            header = next(rows, None)
+            if header is None:
+                continue
+            # Data rows may be wider than the header, so the table is as wide
+            # as the sheet's used range. Sheets saved without a dimension
+            # record take one extra pass to measure.
+            if not worksheet.max_column:
+                worksheet.calculate_dimension(force=True)
+            width = max(len(header), worksheet.max_column or 0)
+            header = _fit_row(header, width)
+            columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+            first = list(itertools.islice(rows, XLSX_BATCH_ROWS))
+            if not columns or not first:
+                continue
+            yield worksheet.title, _xlsx_batches(first, rows, columns)
+    finally:
+        workbook.close()
+
+
+def _xlsx_batches(first: List[tuple], rows: Iterator[tuple], columns: List[str]) -> Iterator[pd.DataFrame]:
+    width = len(columns)
+    batch = first
+    while batch:
+        yield pd.DataFrame([_fit_row(row, width) for row in batch], columns=columns)
+        batch = list(itertools.islice(rows, XLSX_BATCH_ROWS))
+
+
+def _fit_row(row: tuple, width: int) -> tuple:
+    if len(row) > width:
+        if any(value is not None for value in row[width:]):
+            # Only possible if the sheet's dimension record is wrong; fail
+            # rather than drop the cells.
+            raise ValueError(f"A row has {len(row)} cells but the worksheet declares only {width} columns.")
+        return row[:width]
+    return row + (None,) * (width - len(row))
+
+
+def _sqlite_type(series: pd.Series) -> str:
+    """SQLite column type for a pandas column, matching what DataFrame.to_sql would pick."""
+    if pd.api.types.is_bool_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _chunk_rows(chunk: pd.DataFrame) -> Iterable[tuple]:
+    """Rows of a chunk as tuples of plain Python values sqlite3 can bind (NaN -> NULL)."""
+    chunk = chunk.copy(deep=False)
+    for column in chunk.columns:
+        if pd.api.types.is_datetime64_any_dtype(chunk[column]):
+            chunk[column] = chunk[column].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return values.itertuples(index=False, name=None)
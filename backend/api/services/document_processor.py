@@ -1,18 +1,76 @@
+import asyncio
+import multiprocessing
 import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Tuple
-import uuid
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 import numpy as np
-import pypdf
-import docx
 from google import genai
 from google.genai import types
 
+from .embedding_cache import EmbeddingCache
+from .embedding_dispatcher import EMBED_MAX_CONCURRENCY, EmbeddingDispatcher
+from .host_memory import memory_limit_bytes
+from .ivf_index import IVFIndex
+from .lru_cache import LRUCache
+from .text_extraction import extract_chunks, iter_chunks, iter_text_blocks, pdf_page_count
+from .vector_index import MemmapVectorIndex, VectorIndex
+
 EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "gemini-embedding-001")
 EMBEDDING_DIM = int(os.getenv("GEMINI_EMBEDDING_DIM", "768"))
-MAX_CHUNK_CHARS = 1200
 EMBED_BATCH_SIZE = 100  # Gemini API batch limit per request
+# Chunks buffered before embedding+storing a group during ingestion.
+EMBED_FLUSH_CHUNKS = EMBED_BATCH_SIZE * EMBED_MAX_CONCURRENCY
+# When set, indexed chunks are persisted here and reopened on restart
+# instead of living only in memory (point it at a mounted volume).
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR")
+# "exact" scans every chunk; "ivf" adds an approximate index for large corpora.
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "exact").lower()
+# "float32", "float16" or "int8": storage precision of the scanned vectors.
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32").lower()
+# Re-rank quantized search candidates with exact float32 vectors (needs VECTOR_STORE_DIR).
+VECTOR_RESCORE = os.getenv("VECTOR_RESCORE", "true").lower() in ("1", "true", "yes")
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1000"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "0")) or None
+# Rough resident size of one spawned extraction worker (interpreter plus
+# pypdf/python-docx and the pages it holds); used to size the default pool.
+EXTRACTION_WORKER_MEMORY_BYTES = 150 * 1024 * 1024
+# Share of the host's (or container's) memory the default pool may take.
+EXTRACTION_MEMORY_SHARE = 0.25
+
+
+def _default_extraction_workers() -> int:
+    """
+    At most two workers, fewer if the memory doesn't allow it; 0 (a single
+    background thread in this process) when not even one fits, e.g. 512MB.
+    """
+    workers = min(2, os.cpu_count() or 1)
+    memory = memory_limit_bytes()
+    if memory is not None:
+        workers = min(workers, int(memory * EXTRACTION_MEMORY_SHARE // EXTRACTION_WORKER_MEMORY_BYTES))
+    return workers
+
+
+# Worker processes used for PDF/DOCX text extraction; 0 extracts on a
+# single background thread instead. Defaults to what the host's memory
+# allows (at most 2). The pool is started on the first document upload,
+# so hosts that never ingest documents don't pay for it.
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(_default_extraction_workers())))
+# Long PDFs are split into page ranges of this size so one big file is
+# extracted by several workers at once.
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+MAX_EXTRACTION_TASKS_IN_FLIGHT = max(1, EXTRACTION_WORKERS) * 2
 
 
 class DocumentProcessor:
@@ -26,91 +84,229 @@ class DocumentProcessor:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         self.client = genai.Client(api_key=api_key) if api_key else None
-        # chunk_id -> {"content": str, "embedding": np.ndarray, "source": str}
-        self.vector_store: Dict[str, dict] = {}
+        self.dispatcher = EmbeddingDispatcher(self.client) if self.client else None
+        if VECTOR_STORE_DIR:
+            store = MemmapVectorIndex(
+                EMBEDDING_DIM, VECTOR_STORE_DIR, EMBEDDING_MODEL, VECTOR_PRECISION, VECTOR_RESCORE
+            )
+        else:
+            store = VectorIndex(EMBEDDING_DIM, VECTOR_PRECISION, VECTOR_RESCORE)
+        self.vector_store = IVFIndex(store) if VECTOR_INDEX == "ivf" else store
+        self.embedding_cache = EmbeddingCache()
+        self.query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+        self._query_embeddings_in_flight: Dict[tuple, asyncio.Future] = {}
+        self._executor: Optional[Executor] = None
 
-    def process_documents(self, file_paths: List[str], job_id: str, job_statuses: Dict):
+    def process_documents(
+        self, file_paths: List[str], job_id: str, job_statuses: Dict, progress: Optional[Dict[str, Dict]] = None
+    ):
+        """
+        Extracts, chunks, embeds and indexes a batch of documents. If
+        given, ``progress`` gets a live entry per file name (status,
+        chunks extracted so far).
+        """
         print(f"Starting document processing for job_id: {job_id}")
+        # Entries for this batch's files only; ``progress`` may be shared
+        # with the rest of an upload job.
+        file_progress = {os.path.basename(path): {"status": "In Progress", "chunks": 0} for path in file_paths}
+        if progress is not None:
+            progress.update(file_progress)
+        started = time.perf_counter()
+
+        def add_chunks(source: str, chunks: List[str]):
+            file_progress[source]["chunks"] += len(chunks)
+            batcher.add(source, chunks)
 
         if not self.client:
             job_statuses[job_id] = "Failed: GEMINI_API_KEY is not configured on the server."
             return
 
-        total_chunks = 0
+        # Extraction runs in worker processes while this thread embeds and
+        # stores whichever file (or PDF page range) finished first, so
+        # CPU-bound parsing overlaps with network-bound embedding. Only a
+        # bounded number of tasks is in flight and chunks are indexed in
+        # EMBED_FLUSH_CHUNKS groups as they arrive, so memory stays bounded
+        # by batch size rather than by document size.
+        executor = self._extraction_executor()
+        queued: Deque[Tuple[Callable, tuple, str, str]] = deque()
+        pending: Dict[Future, Tuple[str, str]] = {}
+        batcher = _ChunkBatcher(self)
+
+        def submit_queued():
+            while queued and len(pending) < MAX_EXTRACTION_TASKS_IN_FLIGHT:
+                function, args, kind, file_path = queued.popleft()
+                pending[executor.submit(function, *args)] = (kind, file_path)
+
         try:
+            streamed_paths = []
             for file_path in file_paths:
-                content, doc_type = self._extract_text(file_path)
-                chunks = self.dynamic_chunking(content, doc_type)
-                if not chunks:
-                    continue
-
-                embeddings = self._embed_texts(chunks, task_type="RETRIEVAL_DOCUMENT")
-                for chunk, embedding in zip(chunks, embeddings):
-                    chunk_id = str(uuid.uuid4())
-                    self.vector_store[chunk_id] = {
-                        "content": chunk,
-                        "embedding": embedding,
-                        "source": os.path.basename(file_path),
-                    }
-                total_chunks += len(chunks)
+                extension = Path(file_path).suffix.lower()
+                if extension == ".pdf":
+                    queued.append((pdf_page_count, (file_path,), "page_count", file_path))
+                elif extension == ".txt":
+                    # Plain text needs no parsing; stream it here while the
+                    # workers are busy with PDFs/DOCX.
+                    streamed_paths.append(file_path)
+                else:
+                    queued.append((extract_chunks, (file_path,), "chunks", file_path))
+            submit_queued()
 
+            for file_path in streamed_paths:
+                source = os.path.basename(file_path)
+                for chunk in iter_chunks(iter_text_blocks(file_path)):
+                    add_chunks(source, [chunk])
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, file_path = pending.pop(future)
+                    if kind == "page_count":
+                        page_count = future.result()
+                        for start in range(0, page_count, PDF_PAGES_PER_TASK):
+                            stop = min(start + PDF_PAGES_PER_TASK, page_count)
+                            queued.append((extract_chunks, (file_path, start, stop), "chunks", file_path))
+                    else:
+                        add_chunks(os.path.basename(file_path), future.result())
+                submit_queued()
+            batcher.flush()
+
+            elapsed = time.perf_counter() - started
+            for entry in file_progress.values():
+                entry["status"] = "Complete"
+                entry["chunks_per_second"] = round(entry["chunks"] / elapsed, 1) if elapsed > 0 else 0
             job_statuses[job_id] = "Complete"
-            print(f"Job {job_id} complete. Indexed {total_chunks} chunks.")
+            print(f"Job {job_id} complete. Indexed {batcher.indexed} chunks.")
         except Exception as e:
-            job_statuses[job_id] = f"Failed: {e}"
-            print(f"Job {job_id} failed: {e}")
+            for future in pending:
+                future.cancel()
+            reason = str(e)
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. OOM-killed on a huge PDF); this job
+                # fails, the next one gets a fresh pool.
+                self._discard_executor(executor)
+                reason = "an extraction worker exited unexpectedly (out of memory?)"
+            for entry in file_progress.values():
+                entry["status"] = f"Failed: {reason}"
+            job_statuses[job_id] = f"Failed: {reason}"
+            print(f"Job {job_id} failed: {reason}")
 
     def _embed_texts(self, texts: List[str], task_type: str) -> List[np.ndarray]:
-        results: List[np.ndarray] = []
-        for i in range(0, len(texts), EMBED_BATCH_SIZE):
-            batch = texts[i : i + EMBED_BATCH_SIZE]
-            response = self.client.models.embed_content(
-                model=EMBEDDING_MODEL,
-                contents=batch,
-                config=types.EmbedContentConfig(
-                    task_type=task_type, output_dimensionality=EMBEDDING_DIM
-                ),
-            )
-            results.extend(np.array(e.values, dtype=np.float32) for e in response.embeddings)
-        return results
-
-    def embed_query(self, query: str) -> np.ndarray:
-        return self._embed_texts([query], task_type="RETRIEVAL_QUERY")[0]
-
-    def _extract_text(self, file_path: str) -> Tuple[str, str]:
-        file_extension = Path(file_path).suffix.lower()
-        if file_extension == ".pdf":
-            with open(file_path, "rb") as f:
-                reader = pypdf.PdfReader(f)
-                text = "\n".join(page.extract_text() or "" for page in reader.pages)
-            return text, "pdf"
-        elif file_extension == ".docx":
-            doc = docx.Document(file_path)
-            text = "\n".join(para.text for para in doc.paragraphs)
-            return text, "docx"
-        elif file_extension == ".txt":
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
-            return text, "txt"
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+        """
+        Embeds texts in EMBED_BATCH_SIZE batches, consulting the embedding
+        cache first so only texts never seen before go over the wire. The
+        remaining batches are sent concurrently by the dispatcher.
+        """
+        keys = [
+            EmbeddingCache.make_key(text, EMBEDDING_MODEL, EMBEDDING_DIM, task_type) for text in texts
+        ]
+        vectors = self.embedding_cache.get_many(keys)
+
+        # Identical chunks within the same call are only sent once.
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        missing_keys = list(missing)
+        key_batches = [
+            missing_keys[i : i + EMBED_BATCH_SIZE] for i in range(0, len(missing_keys), EMBED_BATCH_SIZE)
+        ]
+        embedded = self.dispatcher.embed_batches(
+            [[missing[key] for key in batch] for batch in key_batches],
+            EMBEDDING_MODEL,
+            self._embed_config(task_type),
+        )
+        for batch_keys, batch_vectors in zip(key_batches, embedded):
+            fresh = dict(zip(batch_keys, batch_vectors))
+            self.embedding_cache.put_many(fresh)
+            vectors.update(fresh)
 
-    def dynamic_chunking(self, content: str, doc_type: str) -> List[str]:
+        return [vectors[key] for key in keys]
+
+    async def embed_query_async(self, query: str) -> np.ndarray:
         """
-        Groups paragraphs into chunks up to MAX_CHUNK_CHARS so embedding
-        requests stay small while preserving paragraph boundaries.
+        Embeds a search query, awaiting the Gemini call instead of blocking
+        the event loop. Results are cached per normalized query text.
         """
-        paragraphs = [p.strip() for p in content.split("\n\n") if p.strip()]
-        chunks: List[str] = []
-        buffer = ""
-        for paragraph in paragraphs:
-            candidate = f"{buffer}\n\n{paragraph}".strip() if buffer else paragraph
-            if len(candidate) <= MAX_CHUNK_CHARS:
-                buffer = candidate
+        key = self._query_cache_key(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+        # A HYBRID question embeds the same text from both of its branches
+        # at once; let them share one request.
+        task = self._query_embeddings_in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_query_embedding(query, key))
+            self._query_embeddings_in_flight[key] = task
+            task.add_done_callback(lambda _: self._query_embeddings_in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_query_embedding(self, query: str, key: tuple) -> np.ndarray:
+        response = await self.client.aio.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=[query],
+            config=self._embed_config("RETRIEVAL_QUERY"),
+        )
+        embedding = np.array(response.embeddings[0].values, dtype=np.float32)
+        self.query_embedding_cache.put(key, embedding)
+        return embedding
+
+    @staticmethod
+    def _query_cache_key(query: str) -> tuple:
+        # Casing and whitespace differences shouldn't cost another API call.
+        return (" ".join(query.lower().split()), EMBEDDING_MODEL, EMBEDDING_DIM)
+
+    @staticmethod
+    def _embed_config(task_type: str) -> types.EmbedContentConfig:
+        return types.EmbedContentConfig(task_type=task_type, output_dimensionality=EMBEDDING_DIM)
+
+    def _extraction_executor(self) -> Executor:
+        # Created on first use and kept for the life of the process, so the
+        # worker start-up cost (spawning, importing pypdf) is paid once.
+        if self._executor is None:
+            if EXTRACTION_WORKERS > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
             else:
-                if buffer:
-                    chunks.append(buffer)
-                buffer = paragraph
-        if buffer:
-            chunks.append(buffer)
-        return chunks
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="extract")
+        return self._executor
+
+    def _discard_executor(self, executor: Executor):
+        # Concurrent jobs share the pool; only the first to see it broken
+        # replaces it.
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ChunkBatcher:
+    """
+    Buffers chunks from any number of files and embeds/stores them once
+    EMBED_FLUSH_CHUNKS have accumulated (enough to keep every dispatcher
+    slot busy), so memory is bounded by the flush size.
+    """
+
+    def __init__(self, processor: DocumentProcessor):
+        self.processor = processor
+        self.indexed = 0
+        self._buffered: Dict[str, List[str]] = {}
+        self._count = 0
+
+    def add(self, source: str, chunks: List[str]):
+        if not chunks:
+            return
+        self._buffered.setdefault(source, []).extend(chunks)
+        self._count += len(chunks)
+        if self._count >= EMBED_FLUSH_CHUNKS:
+            self.flush()
+
+    def flush(self):
+        if not self._count:
+            return
+        groups = list(self._buffered.items())
+        texts = [chunk for _, chunks in groups for chunk in chunks]
+        embeddings = self.processor._embed_texts(texts, task_type="RETRIEVAL_DOCUMENT")
+        offset = 0
+        for source, chunks in groups:
+            self.processor.vector_store.add(np.vstack(embeddings[offset : offset + len(chunks)]), chunks, source)
+            offset += len(chunks)
+        self.indexed += self._count
+        self._buffered = {}
+        self._count = 0
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Iterable
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(tempfile.gettempdir(), "nlp-query-engine-embeddings.db")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# SQLite caps the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded cache of chunk embeddings keyed by a hash of
+    (text, model, dimensionality, task type), so re-uploading a file,
+    shared boilerplate, or re-ingesting after a reset doesn't pay for the
+    same Gemini embedding twice.
+
+    Backed by a small SQLite file (survives restarts if the path is on a
+    volume). Every lookup hit refreshes the entry's ``last_used`` tick and
+    inserts past ``max_entries`` evict the least recently used rows.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._count, last_tick = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM embeddings"
+        ).fetchone()
+        self._tick = last_tick
+
+    @staticmethod
+    def make_key(text: str, model: str, dim: int, task_type: str) -> bytes:
+        payload = "\x1f".join((model, str(dim), task_type, text)).encode("utf-8")
+        return hashlib.sha256(payload).digest()
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, np.ndarray]:
+        """Returns the cached vectors for whichever of ``keys`` are present."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start : start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+            if found:
+                self._tick += 1
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(self._tick, k) for k in found]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        if not items or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._tick += 1
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes(), self._tick) for k, v in items.items()],
+            )
+            self._count += max(cursor.rowcount, 0)
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN"
+                    " (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._count -= overflow
+                self.evictions += overflow
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
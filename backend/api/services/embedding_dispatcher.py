@@ -0,0 +1,104 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from google.genai import errors
+
+# How many embedding requests may be in flight at once during ingestion.
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+# Client-side request budget, kept under the API project's quota so we
+# rarely see a 429 in the first place.
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "100"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class TokenBucket:
+    """Blocking token bucket: ``acquire`` waits until a request is allowed."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes one token, sleeping as needed. Returns how long the caller waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class EmbeddingDispatcher:
+    """
+    Sends embedding batches to Gemini concurrently (up to
+    ``max_concurrency`` in flight), paced by a token bucket, retrying
+    429/5xx responses with exponential backoff and full jitter. Results
+    come back in the same order as the batches went in.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        requests_per_minute: float = EMBED_REQUESTS_PER_MINUTE,
+        max_retries: int = EMBED_MAX_RETRIES,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(requests_per_minute / 60.0, capacity=max(1, max_concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="embed")
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def embed_batches(self, batches: List[List[str]], model: str, config) -> List[List[np.ndarray]]:
+        futures = [self._executor.submit(self._embed_batch, batch, model, config) for batch in batches]
+        return [future.result() for future in futures]
+
+    def _embed_batch(self, batch: List[str], model: str, config) -> List[np.ndarray]:
+        attempt = 0
+        while True:
+            waited = self._bucket.acquire()
+            with self._stats_lock:
+                self.requests += 1
+                self.throttled_seconds += waited
+            try:
+                response = self.client.models.embed_content(model=model, contents=batch, config=config)
+                return [np.array(e.values, dtype=np.float32) for e in response.embeddings]
+            except errors.APIError as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+            delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+            attempt += 1
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_seconds": round(self.throttled_seconds, 2),
+        }
+
+
+def _is_retryable(error: errors.APIError) -> bool:
+    code = error.code or 0
+    return code == 429 or code >= 500
@@ -1,5 +1,6 @@
 import os
 import shutil
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -7,12 +8,18 @@ from .datasources.demo_source import DemoDataSource
 from .datasources.postgres_source import PostgresDataSource
 from .datasources.upload_source import SQLiteUploadDataSource
 from .document_processor import DocumentProcessor
+from .lru_cache import LRUCache
 from .query_engine import QueryEngine
+from .semantic_cache import SemanticSQLCache
 
 DOCUMENT_EXTENSIONS = {".pdf", ".docx", ".txt"}
 STRUCTURED_EXTENSIONS = {".csv", ".xlsx", ".xls"}
 ALLOWED_EXTENSIONS = DOCUMENT_EXTENSIONS | STRUCTURED_EXTENSIONS
 
+# Generated SQL is keyed on the schema it was written against, so it can
+# safely be shared by every engine this manager builds.
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1000"))
+
 
 class EngineManager:
     """
@@ -29,6 +36,8 @@ class EngineManager:
     def __init__(self):
         self.document_processor = DocumentProcessor()
         self.upload_datasource = SQLiteUploadDataSource()
+        self.sql_cache = LRUCache(SQL_CACHE_MAX_ENTRIES)
+        self.semantic_cache = SemanticSQLCache()
         self.engine: Optional[QueryEngine] = None
         self.mode: Optional[str] = None  # "postgres" | "uploads" | "demo"
 
@@ -36,18 +45,18 @@ class EngineManager:
 
     def connect_postgres(self, connection_string: str) -> dict:
         datasource = PostgresDataSource(connection_string)
-        self.engine = QueryEngine(datasource, self.document_processor)
+        self.engine = QueryEngine(datasource, self.document_processor, self.sql_cache, self.semantic_cache)
         self.mode = "postgres"
         return self.engine.schema
 
     def use_demo(self) -> dict:
         datasource = DemoDataSource()
-        self.engine = QueryEngine(datasource, self.document_processor)
+        self.engine = QueryEngine(datasource, self.document_processor, self.sql_cache, self.semantic_cache)
         self.mode = "demo"
         return self.engine.schema
 
     def activate_uploads(self) -> dict:
-        self.engine = QueryEngine(self.upload_datasource, self.document_processor)
+        self.engine = QueryEngine(self.upload_datasource, self.document_processor, self.sql_cache, self.semantic_cache)
         self.mode = "uploads"
         return self.engine.schema
 
@@ -66,30 +75,82 @@ class EngineManager:
             "label": self.engine.datasource.describe() if self.engine else None,
             "schema": self.engine.schema if self.engine else None,
             "document_count": len(self.document_processor.vector_store),
+            "vector_store": self.document_processor.vector_store.stats(),
+            **self.cache_stats(),
+            "index_advisor": self.upload_datasource.index_advisor.stats(),
+            "embedding_dispatcher": (
+                self.document_processor.dispatcher.stats() if self.document_processor.dispatcher else None
+            ),
+        }
+
+    def cache_stats(self) -> dict:
+        """Size and hit/miss counters for every cache the query path goes through."""
+        engine = self.engine
+        return {
+            "result_cache": engine.result_cache.stats() if engine else None,
+            "sql_cache": self.sql_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats(),
+            "prompt_cache": engine.prefix_cache.stats() if engine else None,
+            "query_embedding_cache": self.document_processor.query_embedding_cache.stats(),
+            "embedding_cache": self.document_processor.embedding_cache.stats(),
+            "single_flight": engine.single_flight_stats() if engine else None,
         }
 
     # ---- uploads ----
 
-    def process_uploaded_batch(self, file_paths: List[str], job_id: str, job_statuses: Dict):
+    def process_uploaded_batch(
+        self, file_paths: List[str], job_id: str, job_statuses: Dict, job_details: Optional[Dict] = None
+    ):
+        """
+        Loads a batch of uploads. ``job_statuses[job_id]`` gets the overall
+        status string; ``job_details[job_id]`` (if given) gets per-file
+        results, including rows loaded and rows/sec for structured files.
+        """
         job_statuses[job_id] = "In Progress"
+        files: Dict[str, Dict] = {}
+        if job_details is not None:
+            job_details[job_id] = {"files": files}
 
         doc_paths = [p for p in file_paths if Path(p).suffix.lower() in DOCUMENT_EXTENSIONS]
         structured_paths = [p for p in file_paths if Path(p).suffix.lower() in STRUCTURED_EXTENSIONS]
 
         errors: List[str] = []
 
-        for path in structured_paths:
+        # Documents are extracted and embedded on their own thread while
+        # this one loads the spreadsheets (parsed in parallel, written by
+        # one SQLite writer), so a mixed batch takes as long as its slowest
+        # stage rather than the sum of all of them.
+        doc_thread = None
+        # process_documents reports its own per-file failures into this
+        # temporary dict instead of the batch's job_statuses entry, so a
+        # single bad document doesn't overwrite structured-file results.
+        doc_job_statuses: Dict[str, str] = {}
+        if doc_paths:
+            doc_thread = threading.Thread(
+                target=self.document_processor.process_documents,
+                args=(doc_paths, job_id, doc_job_statuses, files),
+                name=f"documents-{job_id[:8]}",
+            )
+            doc_thread.start()
+
+        if structured_paths:
             try:
-                self.upload_datasource.load_file(path)
+                results = self.upload_datasource.load_files(structured_paths, files)
             except Exception as e:
-                errors.append(f"{os.path.basename(path)}: {e}")
-
-        if doc_paths:
-            # process_documents reports its own per-file failures into this
-            # temporary dict instead of the batch's job_statuses entry, so a
-            # single bad document doesn't overwrite structured-file results.
-            doc_job_statuses: Dict[str, str] = {}
-            self.document_processor.process_documents(doc_paths, job_id, doc_job_statuses)
+                # Not a per-file failure (e.g. the database couldn't be
+                # opened): fail the files that hadn't finished.
+                errors.append(f"Could not load structured files: {e}")
+                for path in structured_paths:
+                    entry = files.setdefault(os.path.basename(path), {})
+                    if entry.get("status") in (None, "In Progress"):
+                        entry["status"] = f"Failed: {e}"
+            else:
+                for path, result in results.items():
+                    if isinstance(result, Exception):
+                        errors.append(f"{os.path.basename(path)}: {result}")
+
+        if doc_thread is not None:
+            doc_thread.join()
             doc_result = doc_job_statuses.get(job_id, "Complete")
             if isinstance(doc_result, str) and doc_result.startswith("Failed"):
                 errors.append(doc_result)
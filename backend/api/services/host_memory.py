@@ -0,0 +1,30 @@
+import os
+from typing import Optional
+
+_CGROUP_LIMIT_PATHS = (
+    "/sys/fs/cgroup/memory.max",  # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+)
+
+
+def memory_limit_bytes() -> Optional[int]:
+    """
+    Memory this process can actually use: the smaller of physical memory
+    and the cgroup (container) limit, or None if neither can be read.
+    Used to size worker and connection pools on small hosts.
+    """
+    limits = []
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (AttributeError, OSError, ValueError):
+        pass
+    for path in _CGROUP_LIMIT_PATHS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # "max" (v2) means unlimited.
+        if value.isdigit():
+            limits.append(int(value))
+    return min(limits) if limits else None
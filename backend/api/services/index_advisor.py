@@ -0,0 +1,266 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+# A column must show up in this many full-scan queries before it gets an
+# index; one-off questions aren't worth the write and the disk space.
+INDEX_ADVISOR_MIN_USES = int(os.getenv("INDEX_ADVISOR_MIN_USES", "2"))
+# Indexes the advisor may add per table, on top of those made at load time.
+INDEX_ADVISOR_MAX_PER_TABLE = int(os.getenv("INDEX_ADVISOR_MAX_PER_TABLE", "5"))
+# Below this many rows a full scan is already fast, so no index is made.
+INDEX_MIN_ROWS = int(os.getenv("INDEX_MIN_ROWS", "10000"))
+# Share of distinct values (in the first loaded chunk) an ID-like column
+# needs to be indexed at load time; low-cardinality codes are skipped.
+ID_INDEX_MIN_DISTINCT_RATIO = 0.1
+
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\"((?:[^\"]|\"\")*)\"|`([^`]*)`|\[([^\]]*)\]|([A-Za-z_][A-Za-z0-9_]*)|(\S)")
+_ID_NAME = re.compile(r"(?:^|[_\s])(?:id|key|code|uuid|guid)$", re.IGNORECASE)
+_CAMEL_ID = re.compile(r"[a-z0-9](?:Id|ID)$")
+# "SCAN t", "SCAN TABLE t" (older SQLite) and transient automatic indexes,
+# which SQLite builds per query exactly when a real index is missing.
+_PLAN_SCAN = re.compile(r"^(?:SCAN (?:TABLE )?(\w+)|SEARCH (?:TABLE )?(\w+) USING AUTOMATIC)")
+
+_CLAUSE_KEYWORDS = {
+    "SELECT", "FROM", "JOIN", "WHERE", "ON", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET",
+    "UNION", "INTERSECT", "EXCEPT", "WITH", "USING", "WINDOW", "VALUES",
+}
+_KEYWORDS = _CLAUSE_KEYWORDS | {
+    "AS", "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "GLOB", "BETWEEN", "EXISTS", "CASE", "WHEN",
+    "THEN", "ELSE", "END", "BY", "ASC", "DESC", "DISTINCT", "ALL", "INNER", "LEFT", "RIGHT", "FULL",
+    "OUTER", "CROSS", "NATURAL", "CAST", "TRUE", "FALSE", "COLLATE", "ESCAPE", "OVER", "PARTITION",
+}
+
+
+class IndexAdvisor:
+    """
+    Adds indexes to uploaded tables based on how they are queried. Each
+    generated query that ran is parsed for the columns it filters, joins
+    or groups on; EXPLAIN QUERY PLAN tells which tables SQLite had to
+    scan. Columns of scanned tables are counted, and once a column has
+    come up INDEX_ADVISOR_MIN_USES times it gets an index, so repeats of
+    that kind of question become index lookups instead of full scans.
+    All of this runs on one background thread, never on the query path.
+    """
+
+    def __init__(self, datasource, engine):
+        # ``datasource`` creates the indexes (it owns writes); ``engine``
+        # is its read-only engine. Plans and catalog lookups go through a
+        # connection of our own with the driver's statement cache off:
+        # SQLite doesn't re-prepare a cached EXPLAIN when the schema
+        # changes, so a reused one keeps reporting scans that an index
+        # built since has already removed.
+        self.datasource = datasource
+        self._engine = create_engine(
+            engine.url,
+            connect_args={"check_same_thread": False, "cached_statements": 0},
+            pool_size=1,
+            max_overflow=0,
+        )
+        self.queries_seen = 0
+        self.indexes_created: List[str] = []
+        self._uses: Counter = Counter()
+        self._created_per_table: Counter = Counter()
+        self._columns: Dict[str, Set[str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-advisor")
+
+    def record(self, sql: str):
+        """Queues an executed query for analysis; returns immediately."""
+        self._executor.submit(self._observe, sql)
+
+    def reset(self):
+        """Forgets usage counts, e.g. after the tables were dropped."""
+        self._executor.submit(self._clear)
+
+    def stats(self) -> dict:
+        return {
+            "queries_seen": self.queries_seen,
+            "tracked_columns": len(self._uses),
+            "indexes_created": list(self.indexes_created),
+        }
+
+    def _clear(self):
+        self._uses.clear()
+        self._created_per_table.clear()
+        self.indexes_created.clear()
+        self._columns.clear()
+
+    def _observe(self, sql: str):
+        try:
+            self.queries_seen += 1
+            aliases, references = parse_column_references(sql)
+            tables = set(aliases.values()) & set(self.datasource.table_names())
+            if not tables or not references:
+                return
+            scanned = self._scanned_tables(sql, aliases)
+            used = set()
+            for qualifier, column in references:
+                table = self._resolve(qualifier, column, aliases, tables)
+                if table is not None and (scanned is None or table in scanned):
+                    used.add((table, column))
+            for table, column in used:
+                self._uses[(table, column)] += 1
+                if self._uses[(table, column)] >= INDEX_ADVISOR_MIN_USES:
+                    self._maybe_index(table, column)
+        except Exception as e:
+            # Advice only; a query we can't analyze just isn't counted.
+            print(f"Index advisor skipped a query: {e}")
+
+    def _scanned_tables(self, sql: str, aliases: Dict[str, str]) -> Optional[Set[str]]:
+        """Tables the query plan reads in full, or None if the plan isn't available."""
+        try:
+            with self._engine.connect() as connection:
+                plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        except Exception:
+            return None
+        scanned = set()
+        for detail in plan:
+            match = _PLAN_SCAN.match(detail)
+            if match:
+                name = (match.group(1) or match.group(2)).lower()
+                scanned.add(aliases.get(name, name))
+        return scanned
+
+    def _resolve(self, qualifier: Optional[str], column: str, aliases: Dict[str, str], tables: Set[str]):
+        if qualifier is not None:
+            table = aliases.get(qualifier)
+            return table if table in tables and column in self._table_columns(table) else None
+        owners = [table for table in tables if column in self._table_columns(table)]
+        return owners[0] if len(owners) == 1 else None
+
+    def _table_columns(self, table: str) -> Set[str]:
+        if table not in self._columns:
+            with self._engine.connect() as connection:
+                rows = connection.exec_driver_sql(f'PRAGMA table_info("{table}")').fetchall()
+            self._columns[table] = {row[1].lower() for row in rows}
+        return self._columns[table]
+
+    def _maybe_index(self, table: str, column: str):
+        if self._created_per_table[table] >= INDEX_ADVISOR_MAX_PER_TABLE:
+            return
+        with self._engine.connect() as connection:
+            if column in leading_index_columns(connection, table):
+                return
+            row_count = connection.exec_driver_sql(f'SELECT MAX(rowid) FROM "{table}"').scalar() or 0
+        if row_count < INDEX_MIN_ROWS:
+            return
+        name = self.datasource.create_index(table, column)
+        if name:
+            self._created_per_table[table] += 1
+            self.indexes_created.append(name)
+            print(f"Index advisor created {name} after {self._uses[(table, column)]} scans of {table}.{column}")
+
+
+def parse_column_references(sql: str) -> Tuple[Dict[str, str], Set[Tuple[Optional[str], str]]]:
+    """
+    Light SQL scan (no full parser): returns ({alias or table: table},
+    {(qualifier or None, column)}) for the columns used in WHERE, JOIN ...
+    ON/USING and GROUP BY clauses, subqueries included. Names are lowered.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        quoted = match.group(1) or match.group(2) or match.group(3)
+        if quoted is not None:
+            tokens.append(("name", quoted.replace('""', '"').lower()))
+        elif match.group(4):
+            word = match.group(4)
+            kind = "keyword" if word.upper() in _KEYWORDS else "name"
+            tokens.append((kind, word.upper() if kind == "keyword" else word.lower()))
+        elif match.group(5):
+            tokens.append(("punct", match.group(5)))
+        # String literals are dropped.
+
+    aliases: Dict[str, str] = {}
+    references: Set[Tuple[Optional[str], str]] = set()
+    clause: Optional[str] = None
+    stack: List[Optional[str]] = []
+    i = 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == "keyword":
+            if value in ("FROM", "JOIN"):
+                clause = "from"
+                i = _read_table(tokens, i + 1, aliases)
+                continue
+            if value in ("WHERE", "ON", "USING"):
+                clause = "filter"
+            elif value == "GROUP":
+                clause = "group"
+            elif value in _CLAUSE_KEYWORDS:
+                clause = None
+        elif kind == "punct":
+            if value == "(":
+                stack.append(clause)
+            elif value == ")":
+                clause = stack.pop() if stack else None
+            elif value == "," and clause == "from":
+                i = _read_table(tokens, i + 1, aliases)
+                continue
+        elif clause in ("filter", "group"):
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if following == ("punct", ".") and i + 2 < len(tokens) and tokens[i + 2][0] == "name":
+                references.add((value, tokens[i + 2][1]))
+                i += 3
+                continue
+            if following != ("punct", "("):  # not a function call
+                references.add((None, value))
+        i += 1
+    return aliases, references
+
+
+def _read_table(tokens: List[tuple], i: int, aliases: Dict[str, str]) -> int:
+    """Reads "table [AS] alias" at ``i`` into ``aliases``; returns the index after it."""
+    if i >= len(tokens) or tokens[i][0] != "name":
+        return i
+    table = tokens[i][1]
+    i += 1
+    # schema.table
+    if i + 1 < len(tokens) and tokens[i] == ("punct", ".") and tokens[i + 1][0] == "name":
+        table = tokens[i + 1][1]
+        i += 2
+    aliases[table] = table
+    if i < len(tokens) and tokens[i] == ("keyword", "AS"):
+        i += 1
+    if i < len(tokens) and tokens[i][0] == "name":
+        aliases[tokens[i][1]] = table
+        i += 1
+    return i
+
+
+def leading_index_columns(connection, table: str) -> Set[str]:
+    """Columns that already lead an index on ``table`` (any index, not just ours)."""
+    columns = set()
+    for index in connection.exec_driver_sql(f'PRAGMA index_list("{table}")').fetchall():
+        info = connection.exec_driver_sql(f'PRAGMA index_info("{index[1]}")').fetchall()
+        if info and info[0][2] is not None:
+            columns.add(info[0][2].lower())
+    return columns
+
+
+def index_name(table: str, column: str) -> str:
+    return f"ix_{table}_{column}"
+
+
+def id_like_columns(chunk: pd.DataFrame, columns: List[str]) -> List[str]:
+    """
+    Which of a new table's columns (``columns`` are the sanitized names,
+    in ``chunk``'s order) look like identifiers worth indexing at load
+    time: named like an ID or key, integer or text typed, and with mostly
+    distinct values in the first chunk.
+    """
+    picked = []
+    rows = len(chunk)
+    for name, source in zip(columns, chunk.columns):
+        raw = str(source)
+        if not (_ID_NAME.search(raw) or _CAMEL_ID.search(raw)):
+            continue
+        series = chunk[source]
+        if not (pd.api.types.is_integer_dtype(series) or pd.api.types.is_object_dtype(series)):
+            continue
+        if rows and series.nunique(dropna=True) / rows >= ID_INDEX_MIN_DISTINCT_RATIO:
+            picked.append(name)
+    return picked
@@ -0,0 +1,161 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .vector_index import VectorIndex
+
+# Below this many chunks a brute-force scan is already fast (and exact),
+# so the coarse quantizer isn't trained until the store outgrows it.
+IVF_MIN_TRAIN_SIZE = int(os.getenv("IVF_MIN_TRAIN_SIZE", "20000"))
+# Number of inverted lists probed per query: the recall/latency knob.
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+# Retrain the centroids once the store has grown by this factor since the
+# last training run, so lists stay balanced as the corpus grows.
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "4"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 32
+ASSIGN_BLOCK_ROWS = 4096
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index layered over a
+    VectorIndex (in-memory or memory-mapped), exposing the same
+    add/search/clear/len API so callers don't care which one they hold.
+
+    Spherical k-means partitions the (already normalized) vectors into
+    about sqrt(N) lists; a query scores the centroids, then only the rows
+    in the ``nprobe`` closest lists. New batches are assigned to their
+    nearest centroid as they're added, and stores smaller than
+    ``min_train_size`` keep using the exact scan.
+
+    The trained state (centroids + lists) is replaced as a whole rather
+    than mutated, so searches can read it without taking the write lock.
+    """
+
+    def __init__(
+        self,
+        base: VectorIndex,
+        nprobe: int = IVF_NPROBE,
+        min_train_size: int = IVF_MIN_TRAIN_SIZE,
+        seed: int = 0,
+    ):
+        self.base = base
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        # (centroids, inverted lists of row ids, rows indexed) or None while untrained
+        self._state: Optional[Tuple[np.ndarray, List[np.ndarray], int]] = None
+        self._trained_size = 0
+
+        # A persistent base may reopen already big enough to need an IVF;
+        # build it in the background so startup time doesn't depend on it.
+        if len(base) and len(base) >= min_train_size:
+            threading.Thread(target=self._build_locked, daemon=True).start()
+
+    @property
+    def dim(self) -> int:
+        return self.base.dim
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def is_trained(self) -> bool:
+        return self._state is not None
+
+    def add(self, embeddings: np.ndarray, contents: List[str], source: str):
+        self.base.add(embeddings, contents, source)
+        self._build_locked()
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, nprobe: Optional[int] = None) -> List[dict]:
+        state = self._state
+        if state is None:
+            return self.base.search(query_embedding, top_k)
+
+        centroids, lists, _ = state
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        probe = min(nprobe or self.nprobe, len(centroids))
+        closest = np.argpartition(centroids @ query, -probe)[-probe:]
+        candidates = np.concatenate([lists[i] for i in closest])
+        return self.base.search(query, top_k, candidates=candidates)
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            **self.base.stats(),
+            "index": "ivf",
+            "ivf_lists": len(state[0]) if state else 0,
+            "nprobe": self.nprobe,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.base.clear()
+            self._state = None
+            self._trained_size = 0
+
+    def _build_locked(self):
+        with self._lock:
+            size = len(self.base)
+            if size == 0 or size < self.min_train_size:
+                return
+            if self._state is None or size >= self._trained_size * IVF_RETRAIN_GROWTH:
+                self._train(size)
+            elif self._state[2] < size:
+                self._assign_new_rows(size)
+
+    def _train(self, size: int):
+        vectors = self.base.vectors()[:size]
+        nlist = max(16, int(np.sqrt(size)))
+        sample_size = min(size, nlist * KMEANS_SAMPLES_PER_LIST)
+        sample = np.asarray(vectors[np.sort(self._rng.choice(size, sample_size, replace=False))], dtype=np.float32)
+        # Quantized stores hold rows at arbitrary positive scale; k-means
+        # averages them, so bring them back to unit length first.
+        sample /= np.linalg.norm(sample, axis=1, keepdims=True) + 1e-10
+        centroids = _spherical_kmeans(sample, nlist, self._rng)
+
+        assignments = _nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        lists = [order[bounds[i] : bounds[i + 1]].astype(np.int64) for i in range(nlist)]
+
+        self._state = (centroids, lists, size)
+        self._trained_size = size
+        print(f"IVF index trained: {nlist} lists over {size} chunks.")
+
+    def _assign_new_rows(self, size: int):
+        centroids, lists, indexed = self._state
+        new_rows = np.arange(indexed, size, dtype=np.int64)
+        assignments = _nearest_centroids(self.base.vectors()[indexed:size], centroids)
+        lists = list(lists)
+        for list_id in np.unique(assignments):
+            lists[list_id] = np.concatenate([lists[list_id], new_rows[assignments == list_id]])
+        self._state = (centroids, lists, size)
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assigns each row to its most similar centroid, in blocks to bound the score matrix."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+        # Re-seed empty clusters with random points so no list goes unused.
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-10)
+    return centroids.astype(np.float32)
@@ -0,0 +1,147 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU cache shared by the engine's in-process caches.
+    Bounded by entry count and, optionally, by the approximate total
+    size of its values (``max_bytes``); values bigger than
+    ``max_entry_bytes`` are not cached at all. Entries can expire after
+    a cache-wide TTL, overridable per entry. Keeps hit/miss/eviction
+    counters.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        # Sizes are only measured when a byte limit needs them, and only
+        # up to the point where the value is known not to fit.
+        if sizeof is None and (max_bytes or max_entry_bytes):
+            limit = min(limit for limit in (max_bytes, max_entry_bytes) if limit)
+            sizeof = functools.partial(approximate_size, limit=limit)
+        self._sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.oversize_skips = 0
+        # key -> (value, expires_at or None, size in bytes)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """
+        Stores ``value``; ``ttl_seconds`` overrides the cache-wide TTL for
+        this entry. Returns False if the value was too big to cache.
+        """
+        if self.max_entries <= 0:
+            return False
+        size = self._sizeof(value) if self._sizeof else 0
+        if (self.max_entry_bytes and size > self.max_entry_bytes) or (self.max_bytes and size > self.max_bytes):
+            with self._lock:
+                self.oversize_skips += 1
+            return False
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self._sizeof:
+            stats.update({
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry_bytes": self.max_entry_bytes,
+                "oversize_skips": self.oversize_skips,
+            })
+        return stats
+
+
+def approximate_size(value: Any, limit: Optional[int] = None) -> int:
+    """
+    Rough in-memory size of a JSON-like value (dicts, lists, strings,
+    numbers, numpy arrays) in bytes. Walks containers iteratively so deep
+    or large results can't hit the recursion limit; shared objects are
+    counted once. With ``limit``, stops as soon as the total exceeds it
+    and returns the partial (over-limit) total.
+    """
+    total = 0
+    seen = set()
+    stack = [value]
+    while stack and (limit is None or total <= limit):
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            # getsizeof already includes the buffer of an array that owns it.
+            total += sys.getsizeof(item) + (item.nbytes if item.base is not None else 0)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from google.genai import types
+
+# Set PROMPT_CACHE=off to always send the full prompt inline.
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "gemini").lower()
+# Gemini refuses explicit caches below a model-specific minimum size
+# (1,024 tokens for 2.5 Flash); smaller prefixes are sent inline, where
+# the API's implicit prefix caching still applies.
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+# Cached prefixes are billed for storage while they live, so keep few.
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "32"))
+# Stop reusing a cache this long before Gemini expires it, so a request
+# never references a cache that disappears mid-flight.
+EXPIRY_MARGIN_SECONDS = 60
+# Rough chars-per-token ratio, only used to decide whether a prefix is
+# big enough to be worth caching.
+CHARS_PER_TOKEN = 4
+
+
+class LocalPrefixCache:
+    """
+    Stand-in used when Gemini context caching is unavailable (disabled,
+    unsupported client, or tests). It never holds a remote cache, so every
+    prompt is sent inline, but it counts prefix reuse the same way.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.created = 0
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+
+    async def lookup(self, prefix: str) -> Optional[str]:
+        """Returns the name of a cached-content resource holding ``prefix``, or None to send it inline."""
+        key = _prefix_key(prefix)
+        self.lookups += 1
+        if key in self._seen:
+            self.hits += 1
+            self._seen.move_to_end(key)
+        else:
+            self._seen[key] = None
+            if len(self._seen) > PROMPT_CACHE_MAX_ENTRIES:
+                self._seen.popitem(last=False)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "backend": "local",
+            "entries": len(self._seen),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "created": self.created,
+        }
+
+
+class GeminiPrefixCache(LocalPrefixCache):
+    """
+    Keeps the static part of the Text-to-SQL prompt (instructions plus
+    rendered schema) in a Gemini cached-content resource, so follow-up
+    requests only send the question. One resource per distinct prefix,
+    least recently used evicted, recreated shortly before its TTL ends.
+    Any failure to create a cache falls back to an inline prompt.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        ttl_seconds: int = PROMPT_CACHE_TTL_SECONDS,
+        min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+        max_entries: int = PROMPT_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__()
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.failures = 0
+        # prefix key -> (cached content name, local expiry)
+        self._caches: "OrderedDict[str, tuple]" = OrderedDict()
+        # Prefixes Gemini refused to cache; not retried.
+        self._uncacheable: set = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def lookup(self, prefix: str) -> Optional[str]:
+        self.lookups += 1
+        if len(prefix) < self.min_tokens * CHARS_PER_TOKEN:
+            return None
+        key = _prefix_key(prefix)
+        if key in self._uncacheable:
+            return None
+
+        name = self._live_name(key)
+        if name:
+            self.hits += 1
+            return name
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have created it while we waited.
+            name = self._live_name(key)
+            if name:
+                self.hits += 1
+                return name
+            try:
+                cached = await self.client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[prefix], ttl=f"{self.ttl_seconds}s", display_name="nl-query-engine-sql-prompt"
+                    ),
+                )
+            except Exception as e:
+                print(f"Prompt cache unavailable, sending prompt inline: {e}")
+                self.failures += 1
+                self._uncacheable.add(key)
+                return None
+            self.created += 1
+            self._caches[key] = (cached.name, time.monotonic() + self.ttl_seconds - EXPIRY_MARGIN_SECONDS)
+            while len(self._caches) > self.max_entries:
+                _, (evicted, _) = self._caches.popitem(last=False)
+                asyncio.ensure_future(self._delete(evicted))
+            return cached.name
+
+    def _live_name(self, key: str) -> Optional[str]:
+        entry = self._caches.get(key)
+        if entry is None:
+            return None
+        name, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._caches[key]
+            return None
+        self._caches.move_to_end(key)
+        return name
+
+    async def _delete(self, name: str):
+        try:
+            await self.client.aio.caches.delete(name=name)
+        except Exception:
+            # It expires on its own at the end of its TTL anyway.
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": "gemini",
+            "entries": len(self._caches),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "created": self.created,
+            "failures": self.failures,
+        }
+
+
+def create_prefix_cache(client, model: str):
+    """Gemini context caching when enabled and supported by the client, otherwise the local stub."""
+    if PROMPT_CACHE != "off" and getattr(getattr(client, "aio", None), "caches", None) is not None:
+        return GeminiPrefixCache(client, model)
+    return LocalPrefixCache()
+
+
+def _prefix_key(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
@@ -1,15 +1,21 @@
-import json
+import asyncio
 import os
 import re
+import secrets
 import time
-from collections import OrderedDict
-from typing import Optional
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 from google import genai
+from google.genai import types
 
-from .datasources.base import BaseSQLDataSource
+from .datasources.base import BaseSQLDataSource, StreamDeadline
 from .document_processor import DocumentProcessor
+from .lru_cache import LRUCache
+from .prompt_cache import create_prefix_cache
+from .schema_rendering import render_schema
+from .schema_retrieval import SchemaRetriever
+from .semantic_cache import SemanticSQLCache
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
@@ -31,6 +37,52 @@ DOC_KEYWORDS = [
 
 MAX_HISTORY = 50
 MAX_CACHE_ENTRIES = 200
+# Cached responses are bounded by their approximate in-memory size, not
+# just their count: one SELECT * over a big upload can be hundreds of MB.
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Bigger results are cheaper to recompute than to keep around.
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_MAX_ENTRY_MB", "8")) * 1024 * 1024
+# Sources that track their own changes (see BaseSQLDataSource.tracks_changes)
+# are invalidated by version; results from anything else, e.g. a
+# PostgreSQL database that can change underneath us, expire after this.
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+# Execution budgets for LLM-generated SQL: results are capped by wrapping
+# the query in a LIMIT (see also STATEMENT_TIMEOUT_SECONDS on the data
+# sources). Streaming exists for big results, so it gets a higher cap.
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "10000"))
+MAX_STREAM_ROWS = int(os.getenv("MAX_STREAM_ROWS", "1000000"))
+
+# Per-branch budgets for answering a question. A HYBRID question runs
+# both branches at once and returns whatever finished in time.
+SQL_BRANCH_TIMEOUT_SECONDS = float(os.getenv("SQL_BRANCH_TIMEOUT_SECONDS", "60"))
+DOCUMENT_BRANCH_TIMEOUT_SECONDS = float(os.getenv("DOCUMENT_BRANCH_TIMEOUT_SECONDS", "20"))
+
+# Paginated queries keep a small server-side record per outstanding page.
+MAX_PAGE_TOKENS = 1000
+PAGE_TOKEN_TTL_SECONDS = float(os.getenv("PAGE_TOKEN_TTL_SECONDS", "600"))
+
+
+class ResultExpiredError(LookupError):
+    """A page token that has expired, is unknown, or predates a data change."""
+
+
+class InvalidSQLError(ValueError):
+    """Generated SQL that failed validation; carries the SQL so responses can show what was rejected."""
+
+    def __init__(self, message: str, sql: str):
+        super().__init__(message)
+        self.sql = sql
+
+
+class ResolvedSQL(NamedTuple):
+    """SQL for one question plus what's needed to cache it once it has run."""
+
+    sql: str
+    prompt_info: dict
+    sql_key: tuple
+    user_query: str
+    embedding: Optional[np.ndarray]
 
 
 class QueryEngine:
@@ -42,7 +94,13 @@ class QueryEngine:
     of which BaseSQLDataSource is passed in.
     """
 
-    def __init__(self, datasource: BaseSQLDataSource, document_processor: DocumentProcessor):
+    def __init__(
+        self,
+        datasource: BaseSQLDataSource,
+        document_processor: DocumentProcessor,
+        sql_cache: Optional[LRUCache] = None,
+        semantic_cache: Optional[SemanticSQLCache] = None,
+    ):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError(
@@ -52,17 +110,46 @@ class QueryEngine:
         self.datasource = datasource
         self.document_processor = document_processor
         self.schema = datasource.get_schema()
-
-        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self.schema_retriever = SchemaRetriever(self.schema)
+        self.prefix_cache = create_prefix_cache(self.client, GEMINI_MODEL)
+
+        # Two cache tiers. sql_cache maps (question, dialect, schema) to
+        # generated SQL and is owned by EngineManager so it outlives this
+        # engine; result_cache holds whole responses and is keyed on the
+        # data versions, so new uploads or documents miss it.
+        self.sql_cache = sql_cache if sql_cache is not None else LRUCache(MAX_CACHE_ENTRIES)
+        self.result_cache = LRUCache(
+            MAX_CACHE_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES, max_entry_bytes=RESULT_CACHE_MAX_ENTRY_BYTES
+        )
+        # Reworded questions are matched by embedding, only against SQL
+        # written for this exact dialect and schema.
+        self.semantic_cache = semantic_cache if semantic_cache is not None else SemanticSQLCache()
+        self._semantic_scope = (datasource.dialect, self.schema_retriever.fingerprint)
+        # Identical questions already being answered, keyed like
+        # result_cache; later callers await the same task.
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        self.coalesced_queries = 0
+        # page token -> where the next page of a paginated query starts
+        self._page_tokens = LRUCache(MAX_PAGE_TOKENS, ttl_seconds=PAGE_TOKEN_TTL_SECONDS)
         self._history: list = []
         print(f"Query Engine initialized against {datasource.describe()}.")
 
-    def process_query(self, user_query: str) -> dict:
+    async def process_query(self, user_query: str, columnar: bool = False) -> dict:
+        """
+        Answers a natural-language question. Every network/database wait
+        (Gemini generation, query embedding, SQL execution) is awaited, so
+        a single worker can keep many queries in flight at once. With
+        ``columnar``, SQL results come back as {"columns", "data"} (one
+        value list per column) instead of a dict per row.
+        """
         start_time = time.time()
-        cache_key = user_query.strip().lower()
+        question = _normalize_question(user_query)
+        # Read the versions before running anything, so a result computed
+        # while an upload lands is filed under the older version.
+        cache_key = (question, self.datasource.version, len(self.document_processor.vector_store), columnar)
 
-        if cache_key in self._cache:
-            cached = self._cache[cache_key]
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
             result = dict(cached)
             result["performance_metrics"] = {
                 "response_time_seconds": round(time.time() - start_time, 4),
@@ -71,25 +158,77 @@ class QueryEngine:
             self._record_history(user_query, result["query_type"])
             return result
 
-        query_type = self._classify_query(user_query)
-        sql_query: Optional[str] = None
-        sql_results = None
-        doc_results = None
-
-        try:
-            if query_type in ("SQL", "HYBRID") and self.schema.get("tables"):
-                sql_query = self._generate_sql(user_query)
-                self._validate_sql_query(sql_query)
-                sql_results = self.datasource.execute(sql_query)
+        # Single flight: a burst of the same question (e.g. a dashboard
+        # refresh) shares one generation + execution instead of each
+        # missing the cache and doing its own. The shared task is shielded
+        # so one caller disconnecting doesn't cancel it for the others.
+        task = self._in_flight.get(cache_key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced_queries += 1
+        else:
+            task = asyncio.ensure_future(self._answer(user_query, question, cache_key, start_time, columnar))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(cache_key, None))
+        response = await asyncio.shield(task)
+
+        if coalesced and "performance_metrics" in response:
+            response = dict(response)
+            response["performance_metrics"] = {
+                **response["performance_metrics"],
+                "response_time_seconds": round(time.time() - start_time, 2),
+                "coalesced": True,
+            }
+        if "error" not in response:
+            self._record_history(user_query, response["query_type"])
+        return response
 
-            if query_type in ("DOCUMENT", "HYBRID"):
-                doc_results = self._search_documents(user_query)
-        except Exception as e:
+    async def _answer(
+        self, user_query: str, question: str, cache_key: tuple, start_time: float, columnar: bool
+    ) -> dict:
+        """
+        Classifies the question, then runs the SQL branch (generation +
+        execution) and the document branch (query embedding + vector
+        search) concurrently, each under its own timeout. If one branch
+        of a HYBRID query fails or times out, the other's results are
+        still returned (flagged ``partial``). Complete responses are cached.
+        """
+        query_type = self._classify_query(user_query)
+        sql_state = {"sql": None, "prompt_info": {}, "results": None, "truncated": False}
+
+        async def sql_branch():
+            try:
+                resolved = await self._resolve_sql(user_query, question)
+            except InvalidSQLError as e:
+                sql_state["sql"] = e.sql
+                raise
+            sql_state["sql"], sql_state["prompt_info"] = resolved.sql, resolved.prompt_info
+            # Never pull more than MAX_RESULT_ROWS back from a generated query.
+            sql_state["results"], sql_state["truncated"] = await self._fetch(
+                resolved.sql, MAX_RESULT_ROWS, 0, columnar
+            )
+            self._remember_sql(resolved)
+
+        branches = {}
+        if query_type in ("SQL", "HYBRID") and self.schema.get("tables"):
+            branches["sql"] = _run_branch(sql_branch(), SQL_BRANCH_TIMEOUT_SECONDS)
+        if query_type in ("DOCUMENT", "HYBRID"):
+            branches["document"] = _run_branch(self._search_documents(user_query), DOCUMENT_BRANCH_TIMEOUT_SECONDS)
+        outcomes = dict(zip(branches, await asyncio.gather(*branches.values())))
+
+        sql_query = sql_state["sql"]
+        errors = {name: error for name, (_, error, _) in outcomes.items() if error}
+        if errors and len(errors) == len(outcomes):
             return {
-                "error": str(e),
+                "error": "; ".join(errors.values()),
                 "query_type": query_type,
                 "generated_sql": sql_query,
             }
+        sql_results = sql_state["results"]
+        doc_results = outcomes["document"][0] if "document" in outcomes else None
+        prompt_info = sql_state["prompt_info"]
+        truncated = sql_state["truncated"]
+        branch_timings = {f"{name}_branch_seconds": round(seconds, 3) for name, (_, _, seconds) in outcomes.items()}
 
         if query_type == "HYBRID":
             results = {"database": sql_results or [], "documents": doc_results or []}
@@ -104,16 +243,147 @@ class QueryEngine:
             "performance_metrics": {
                 "response_time_seconds": round(time.time() - start_time, 2),
                 "cache_hit": False,
+                **branch_timings,
+                **prompt_info,
             },
             "generated_sql": sql_query,
+            "truncated": truncated,
         }
+        if truncated:
+            response["row_limit"] = MAX_RESULT_ROWS
+        if errors:
+            # One HYBRID branch failed; answer with the other, but don't
+            # cache an incomplete response.
+            response["partial"] = True
+            response["errors"] = {("database" if name == "sql" else "documents"): e for name, e in errors.items()}
+            return response
+
+        result_ttl = None if self.datasource.tracks_changes else (RESULT_CACHE_TTL_SECONDS or None)
+        # Sizing a big response walks every row; keep that off the event loop.
+        await asyncio.to_thread(self.result_cache.put, cache_key, response, result_ttl)
+        return response
 
-        self._cache[cache_key] = response
-        if len(self._cache) > MAX_CACHE_ENTRIES:
-            self._cache.popitem(last=False)
-        self._record_history(user_query, query_type)
+    async def process_query_page(
+        self, user_query: str, page_size: int, page_token: Optional[str] = None, columnar: bool = False
+    ) -> dict:
+        """
+        Returns one page of a query's SQL results plus a ``next_page_token``
+        (None on the last page). The first call generates the SQL as
+        usual; a page token remembers it server-side, and each later page
+        re-runs it with LIMIT/OFFSET, so no request ever materializes more
+        than one page. Paged responses bypass the whole-response cache.
+        Tokens expire after PAGE_TOKEN_TTL_SECONDS or when the data
+        changes (ResultExpiredError). Document results (HYBRID) come with
+        the first page only.
+        """
+        start_time = time.time()
+        if page_token is not None:
+            page = self._page_tokens.get(page_token)
+            if page is None or page["version"] != self.datasource.version:
+                raise ResultExpiredError("This page token has expired. Run the query again.")
+            sql_query, query_type, offset = page["sql"], page["query_type"], page["offset"]
+        else:
+            query_type = self._classify_query(user_query)
+            if query_type == "DOCUMENT" or not self.schema.get("tables"):
+                return await self.process_query(user_query, columnar)
+            sql_query, offset = None, 0
+        prompt_info: dict = {}
+        doc_results = None
 
-        return response
+        try:
+            if page_token is None:
+                resolved = await self._resolve_sql(user_query, _normalize_question(user_query))
+                sql_query, prompt_info = resolved.sql, resolved.prompt_info
+                if query_type == "HYBRID":
+                    doc_results = await self._search_documents(user_query)
+            rows, has_more = await self._fetch(sql_query, page_size, offset, columnar)
+        except InvalidSQLError as e:
+            return {"error": str(e), "query_type": query_type, "generated_sql": e.sql}
+        except Exception as e:
+            return {"error": str(e), "query_type": query_type, "generated_sql": sql_query}
+        if page_token is None:
+            self._remember_sql(resolved)
+            self._record_history(user_query, query_type)
+
+        next_page_token = None
+        if has_more:
+            next_page_token = secrets.token_urlsafe(16)
+            self._page_tokens.put(next_page_token, {
+                "sql": sql_query,
+                "query_type": query_type,
+                "offset": offset + page_size,
+                "version": self.datasource.version,
+            })
+
+        results = {"database": rows, "documents": doc_results or []} if query_type == "HYBRID" else rows
+        return {
+            "results": results,
+            "query_type": query_type,
+            "performance_metrics": {
+                "response_time_seconds": round(time.time() - start_time, 2),
+                "cache_hit": False,
+                **prompt_info,
+            },
+            "generated_sql": sql_query,
+            "page": {"offset": offset, "page_size": page_size, "next_page_token": next_page_token},
+        }
+
+    async def _fetch(self, sql: str, limit: int, offset: int, columnar: bool) -> Tuple[object, bool]:
+        """
+        Runs ``sql`` for at most ``limit`` rows from ``offset``, as row
+        dicts or columns. Returns (results, whether more rows exist); one
+        extra row is fetched to tell.
+        """
+        capped_sql = _limit_sql(sql, limit + 1, offset)
+        if columnar:
+            table = await self.datasource.execute_columnar_async(capped_sql)
+            has_more = bool(table["data"]) and len(table["data"][0]) > limit
+            if has_more:
+                table["data"] = [values[:limit] for values in table["data"]]
+            return table, has_more
+        rows = await self.datasource.execute_async(capped_sql)
+        return rows[:limit], len(rows) > limit
+
+    async def prepare_stream(self, user_query: str) -> Tuple[dict, Optional[StreamDeadline], list]:
+        """
+        Resolves a question for the streaming endpoint without running the
+        whole query: returns (metadata, row batches, document results).
+        The row batches come from a server-side cursor and are read lazily
+        by whoever iterates them, so time-to-first-row and memory don't
+        depend on the size of the result; the cursor is closed once
+        STREAM_TIMEOUT_SECONDS pass, however far the reader got. ``row
+        batches`` is None when the question is answered from documents only.
+        """
+        start_time = time.time()
+        query_type = self._classify_query(user_query)
+        metadata = {"query_type": query_type, "generated_sql": None}
+        row_batches = None
+        if query_type in ("SQL", "HYBRID") and self.schema.get("tables"):
+            resolved = await self._resolve_sql(user_query, _normalize_question(user_query))
+            metadata["generated_sql"] = resolved.sql
+            metadata["performance_metrics"] = {
+                "time_to_sql_seconds": round(time.time() - start_time, 2),
+                **resolved.prompt_info,
+            }
+            metadata["row_limit"] = MAX_STREAM_ROWS
+            row_batches = StreamDeadline(self._stream_rows(resolved))
+        doc_results = await self._search_documents(user_query) if query_type in ("DOCUMENT", "HYBRID") else []
+        self._record_history(user_query, query_type)
+        return metadata, row_batches, doc_results
+
+    def _stream_rows(self, resolved: "ResolvedSQL") -> Iterator[List[Dict]]:
+        remembered = False
+        # The caller stops after MAX_STREAM_ROWS; the extra row tells it
+        # the result was truncated.
+        for batch in self.datasource.iter_rows(_limit_sql(resolved.sql, MAX_STREAM_ROWS + 1)):
+            if not remembered:
+                # The query has run, so the SQL is worth caching.
+                self._remember_sql(resolved)
+                remembered = True
+            yield batch
+
+    def single_flight_stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "coalesced_queries": self.coalesced_queries}
 
     def _record_history(self, user_query: str, query_type: str):
         self._history.append({"query": user_query, "query_type": query_type})
@@ -123,57 +393,118 @@ class QueryEngine:
     def get_history(self) -> list:
         return list(reversed(self._history[-20:]))
 
-    def _search_documents(self, user_query: str, top_k: int = 3) -> list:
+    async def _search_documents(self, user_query: str, top_k: int = 3) -> list:
         """Performs a vector search on the ingested documents."""
         store = self.document_processor.vector_store
         if not store:
             return []
 
-        query_embedding = self.document_processor.embed_query(user_query)
-
-        doc_ids = list(store.keys())
-        doc_embeddings = np.array([store[doc_id]["embedding"] for doc_id in doc_ids])
-
-        query_norm = query_embedding / (np.linalg.norm(query_embedding) + 1e-10)
-        doc_norms = doc_embeddings / (
-            np.linalg.norm(doc_embeddings, axis=1, keepdims=True) + 1e-10
-        )
-
-        similarities = np.dot(doc_norms, query_norm)
-
-        k = min(top_k, len(doc_ids))
-        top_k_indices = np.argsort(similarities)[-k:][::-1]
-
-        results = []
-        for index in top_k_indices:
-            doc_id = doc_ids[index]
-            results.append(
-                {
-                    "content": store[doc_id]["content"],
-                    "source": store[doc_id]["source"],
-                    "similarity": float(similarities[index]),
-                }
-            )
-        return results
-
-    def _generate_sql(self, user_query: str) -> str:
-        prompt = f"""You are an expert Text-to-SQL model. Your task is to generate a single, executable, read-only SQL query for a {self.datasource.dialect} database.
+        query_embedding = await self.document_processor.embed_query_async(user_query)
+        # The scan is numpy work that releases the GIL; run it off the
+        # event loop so the SQL branch (and other requests) keep moving.
+        return await asyncio.to_thread(store.search, query_embedding, top_k)
+
+    async def _resolve_sql(self, user_query: str, question: str) -> "ResolvedSQL":
+        """
+        Finds the SQL for a question: from the exact SQL cache, then the
+        semantic cache, and only then by asking the model. Only the
+        relevant tables go into the prompt (see SchemaRetriever). The
+        result isn't cached until _remember_sql is called after it ran.
+        """
+        schema = self.schema_retriever.select(user_query)
+        sql_key = (question, self.datasource.dialect, schema["fingerprint"])
+        cached_sql = self.sql_cache.get(sql_key)
+        if cached_sql is not None:
+            return ResolvedSQL(cached_sql, {"sql_cache_hit": True, "prompt_tokens": 0}, sql_key, user_query, None)
+
+        semantic_sql, question_embedding, similarity = await self._semantic_lookup(user_query)
+        if semantic_sql is not None:
+            sql_query, prompt_info = semantic_sql, {"sql_cache_hit": False, "prompt_tokens": 0}
+            # Already in the semantic cache; don't add it twice.
+            question_embedding = None
+        else:
+            sql_query, prompt_info = await self._generate_sql(user_query, schema)
+            try:
+                self._validate_sql_query(sql_query)
+            except ValueError as e:
+                raise InvalidSQLError(str(e), sql_query) from None
+        prompt_info.update({
+            "semantic_cache_hit": semantic_sql is not None,
+            "semantic_similarity": round(similarity, 4),
+            "semantic_cache_hit_rate": self.semantic_cache.stats()["hit_rate"],
+        })
+        return ResolvedSQL(sql_query, prompt_info, sql_key, user_query, question_embedding)
+
+    def _remember_sql(self, resolved: "ResolvedSQL"):
+        """Caches SQL that has validated and run cleanly."""
+        self.datasource.record_query(resolved.sql)
+        self.sql_cache.put(resolved.sql_key, resolved.sql)
+        if resolved.embedding is not None:
+            self.semantic_cache.put(self._semantic_scope, resolved.user_query, resolved.embedding, resolved.sql)
+
+    async def _semantic_lookup(self, user_query: str) -> Tuple[Optional[str], Optional[np.ndarray], float]:
+        """
+        Looks for SQL generated earlier for a differently-worded version
+        of this question. Returns (sql or None, question embedding,
+        best similarity). The embedding goes through the query-embedding
+        cache, so a HYBRID query's document search reuses it.
+        """
+        if self.semantic_cache.max_entries <= 0:
+            return None, None, 0.0
+        try:
+            embedding = await self.document_processor.embed_query_async(user_query)
+        except Exception as e:
+            # The cache is an optimization; never fail a query over it.
+            print(f"Skipping semantic cache lookup: {e}")
+            return None, None, 0.0
+        sql, similarity = self.semantic_cache.lookup(self._semantic_scope, user_query, embedding)
+        return sql, embedding, similarity
+
+    async def _generate_sql(self, user_query: str, schema: dict) -> Tuple[str, dict]:
+        """
+        Generates SQL from a prompt that carries only the given (pruned)
+        schema, rendered as compact DDL. The static instructions + schema
+        come first so they can be served from a cached prefix; only the
+        question is sent fresh. Returns the query plus prompt metrics for
+        performance_metrics.
+        """
+        prefix = f"""You are an expert Text-to-SQL model. Your task is to generate a single, executable, read-only SQL query for a {self.datasource.dialect} database.
 You must only output the SQL query and nothing else. Do not include any explanations or markdown formatting.
 Only ever generate a single SELECT statement. Never generate INSERT, UPDATE, DELETE, DROP, ALTER, or any other statement that modifies data or schema.
 
 Database Schema:
-{json.dumps(self.schema, indent=2)}
-
+{render_schema(schema)}
+"""
+        question = f"""
 User Question:
 "{user_query}"
 
 SQL Query:
 """
-        response = self.client.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+        cached_prefix = await self.prefix_cache.lookup(prefix)
+        if cached_prefix:
+            response = await self.client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=question,
+                config=types.GenerateContentConfig(cached_content=cached_prefix),
+            )
+        else:
+            response = await self.client.aio.models.generate_content(model=GEMINI_MODEL, contents=prefix + question)
         sql_query = (response.text or "").strip()
         sql_query = re.sub(r"^```(sql)?", "", sql_query, flags=re.IGNORECASE).strip()
         sql_query = re.sub(r"```$", "", sql_query).strip()
-        return sql_query
+
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        prompt_info = {
+            "sql_cache_hit": False,
+            # Rough 4-chars-per-token estimate if the API didn't report usage.
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else len(prefix + question) // 4,
+            "cached_prompt_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+            "schema_tables_in_prompt": len(schema["tables"]),
+            "schema_tables_total": len(self.schema.get("tables", [])),
+        }
+        return sql_query, prompt_info
 
     def _classify_query(self, user_query: str) -> str:
         query_lower = user_query.lower()
@@ -200,3 +531,27 @@ SQL Query:
         for keyword in FORBIDDEN_SQL_KEYWORDS:
             if re.search(rf"\b{keyword}\b", lowered):
                 raise ValueError(f"Query contains a forbidden keyword: {keyword}")
+
+
+def _normalize_question(user_query: str) -> str:
+    return " ".join(user_query.lower().split())
+
+
+async def _run_branch(coroutine, timeout: float) -> Tuple[object, Optional[str], float]:
+    """Awaits one branch under a timeout. Returns (result, error message or None, seconds taken)."""
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coroutine, timeout)
+        return result, None, time.perf_counter() - started
+    except asyncio.TimeoutError:
+        return None, f"Timed out after {timeout:g}s.", time.perf_counter() - started
+    except Exception as e:
+        return None, str(e), time.perf_counter() - started
+
+
+def _limit_sql(sql: str, limit: int, offset: int = 0) -> str:
+    # Wrapping keeps the generated query's own ORDER BY/LIMIT intact. The
+    # inner query gets lines of its own so a trailing "-- comment" in it
+    # can't swallow the wrapper.
+    inner = sql.strip().rstrip(";").strip()
+    return f"SELECT * FROM (\n{inner}\n) AS page LIMIT {int(limit)} OFFSET {int(offset)}"
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import re
+from typing import Dict, List
+
+from .lru_cache import LRUCache
+
+# Distinct schemas (or pruned table subsets) whose rendering is kept.
+RENDERED_SCHEMA_CACHE_SIZE = 256
+
+_SIMPLE_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_rendered = LRUCache(RENDERED_SCHEMA_CACHE_SIZE)
+
+
+def schema_fingerprint(schema: Dict) -> str:
+    """Stable hash of a schema dict; equal schemas always fingerprint the same."""
+    payload = json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_schema(schema: Dict) -> str:
+    """
+    Renders a discovered schema as compact DDL, one line per table:
+
+        employees(id INTEGER, name VARCHAR, department_id INTEGER REFERENCES departments(id))
+
+    This carries the same information as the pretty-printed JSON at a
+    fraction of the tokens. Renderings are memoized by fingerprint, so a
+    schema (or pruned subset) is only rendered once. Pass schemas that
+    carry a precomputed "fingerprint" (as SchemaRetriever.select returns
+    them): hashing a large schema costs more than rendering it.
+    """
+    fingerprint = schema.get("fingerprint") or schema_fingerprint(schema)
+    text = _rendered.get(fingerprint)
+    if text is None:
+        text = "\n".join(_render_table(table) for table in schema.get("tables", []))
+        _rendered.put(fingerprint, text)
+    return text
+
+
+def _render_table(table: Dict) -> str:
+    references: Dict[str, str] = {}
+    table_constraints: List[str] = []
+    for fk in table.get("foreign_keys", []):
+        local = fk.get("constrained_columns") or []
+        remote = fk.get("referred_columns") or []
+        target = _quote(fk.get("referred_table", ""))
+        if len(local) == 1 and len(remote) == 1:
+            references[local[0]] = f"{target}({_quote(remote[0])})"
+        elif local:
+            table_constraints.append(
+                f"FOREIGN KEY ({', '.join(map(_quote, local))}) REFERENCES {target}({', '.join(map(_quote, remote))})"
+            )
+
+    parts = []
+    for column in table.get("columns", []):
+        part = f"{_quote(column['name'])} {column.get('type', '')}".rstrip()
+        if column["name"] in references:
+            part += f" REFERENCES {references[column['name']]}"
+        parts.append(part)
+    parts.extend(table_constraints)
+    return f"{_quote(table['name'])}({', '.join(parts)})"
+
+
+def _quote(identifier: str) -> str:
+    if _SIMPLE_IDENTIFIER.match(identifier):
+        return identifier
+    return '"' + identifier.replace('"', '""') + '"'
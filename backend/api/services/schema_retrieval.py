@@ -0,0 +1,143 @@
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Set
+
+from .schema_rendering import schema_fingerprint
+
+# Schemas this small are sent whole: pruning saves little and risks
+# dropping a table the question needed.
+SCHEMA_PRUNE_MIN_TABLES = int(os.getenv("SCHEMA_PRUNE_MIN_TABLES", "12"))
+# Best-matching tables kept per question, before foreign-key expansion.
+SCHEMA_TOP_TABLES = int(os.getenv("SCHEMA_TOP_TABLES", "6"))
+# Hard cap on tables in the prompt, including joined-in neighbours.
+SCHEMA_MAX_TABLES = int(os.getenv("SCHEMA_MAX_TABLES", "15"))
+
+# Table-name matches say more about relevance than column-name matches.
+TABLE_NAME_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "give", "has", "have", "how", "i", "in", "is", "it", "list", "me", "many",
+    "much", "of", "on", "or", "show", "tell", "than", "that", "the", "their",
+    "there", "this", "to", "was", "we", "were", "what", "when", "where", "which",
+    "who", "with", "all", "each", "per", "top", "most", "least", "find", "get",
+}
+
+
+class SchemaRetriever:
+    """
+    Picks the part of a (possibly very large) discovered schema that is
+    relevant to one question, so the Text-to-SQL prompt doesn't carry
+    hundreds of unrelated tables.
+
+    Each table is indexed as a bag of words from its name (weighted up)
+    and its column names, split on snake_case/camelCase and lightly
+    stemmed. A question is scored against every table with BM25; the top
+    tables are kept, plus the tables they join to through foreign keys in
+    either direction, so the model can still write the joins it needs.
+    """
+
+    def __init__(self, schema: Dict):
+        self.tables: List[Dict] = schema.get("tables", [])
+        # Hashed once per loaded schema; every selection carries a key
+        # derived from it, so caches downstream never re-hash the schema.
+        self.fingerprint = schema_fingerprint(schema)
+        self._by_name = {table["name"]: table for table in self.tables}
+        self._documents = [Counter(_table_terms(table)) for table in self.tables]
+        self._lengths = [sum(doc.values()) for doc in self._documents]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency: Counter = Counter()
+        for doc in self._documents:
+            document_frequency.update(doc.keys())
+        total = len(self._documents)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+        self._neighbours = _foreign_key_neighbours(self.tables)
+
+    def select(self, question: str) -> Dict:
+        """
+        Returns a schema dict ({"tables": [...], "fingerprint": ...})
+        containing only the tables relevant to ``question``. The
+        fingerprint identifies that exact table set within this schema.
+        """
+        if len(self.tables) <= SCHEMA_PRUNE_MIN_TABLES:
+            return self._full_schema()
+
+        scores = self._score(question)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0), key=lambda i: scores[i], reverse=True
+        )
+        if not ranked:
+            # Nothing matched lexically; sending everything is the only
+            # way the model can still find the right table.
+            return self._full_schema()
+
+        selected: List[str] = [self.tables[i]["name"] for i in ranked[:SCHEMA_TOP_TABLES]]
+        seen: Set[str] = set(selected)
+        for name in list(selected):
+            for neighbour in sorted(self._neighbours.get(name, ())):
+                if len(selected) >= SCHEMA_MAX_TABLES:
+                    break
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    selected.append(neighbour)
+
+        # Keep the original discovery order so the same table set always
+        # renders the same prompt.
+        tables = [table for table in self.tables if table["name"] in seen]
+        subset_key = hashlib.sha256("\0".join(table["name"] for table in tables).encode("utf-8")).hexdigest()
+        return {"tables": tables, "fingerprint": f"{self.fingerprint}:{subset_key}"}
+
+    def _full_schema(self) -> Dict:
+        return {"tables": self.tables, "fingerprint": self.fingerprint}
+
+    def _score(self, question: str) -> List[float]:
+        terms = [t for t in _tokenize(question) if t not in STOPWORDS]
+        scores = [0.0] * len(self._documents)
+        for i, doc in enumerate(self._documents):
+            length_norm = 1 - BM25_B + BM25_B * (self._lengths[i] / (self._average_length or 1))
+            for term in terms:
+                frequency = doc.get(term)
+                if frequency:
+                    scores[i] += self._idf[term] * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        return scores
+
+
+def _table_terms(table: Dict) -> List[str]:
+    terms = _tokenize(table["name"]) * TABLE_NAME_WEIGHT
+    for column in table.get("columns", []):
+        terms.extend(_tokenize(column["name"]))
+    return terms
+
+
+def _foreign_key_neighbours(tables: List[Dict]) -> Dict[str, Set[str]]:
+    neighbours: Dict[str, Set[str]] = {table["name"]: set() for table in tables}
+    for table in tables:
+        for fk in table.get("foreign_keys", []):
+            referred = fk.get("referred_table")
+            if referred and referred in neighbours and referred != table["name"]:
+                neighbours[table["name"]].add(referred)
+                neighbours[referred].add(table["name"])
+    return neighbours
+
+
+def _tokenize(text: str) -> List[str]:
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return [_stem(word) for word in re.findall(r"[a-z0-9]+", text.lower())]
+
+
+def _stem(word: str) -> str:
+    """Just enough stemming to match plurals ("customers" -> "customer", "categories" -> "category")."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+
+# Cosine similarity above which two questions are treated as the same
+# question. Kept high: a false hit returns the wrong answer, a miss only
+# costs one generation.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+class SemanticSQLCache:
+    """
+    Reuses generated SQL across differently-worded versions of the same
+    question ("top 5 customers by revenue" / "which 5 customers spent the
+    most"). Question embeddings live in a small in-memory matrix; a lookup
+    is one matrix-vector product over the entries for the same scope
+    (dialect + schema fingerprint), so SQL written against another schema
+    is never reused. The numbers in both questions must also match, since
+    "top 5" and "top 10" embed almost identically but need different SQL.
+    Least recently used entries are evicted.
+    """
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        # slot -> (scope, numbers, sql), in LRU order
+        self._slots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def lookup(self, scope: Hashable, question: str, embedding: np.ndarray) -> Tuple[Optional[str], float]:
+        """Returns (sql, similarity) for the closest cached question in ``scope``; sql is None below the threshold."""
+        query = _normalize(embedding)
+        numbers = _numbers(question)
+        with self._lock:
+            if self._vectors is None or not self._slots or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None, 0.0
+            slots = [slot for slot, (s, n, _) in self._slots.items() if s == scope and n == numbers]
+            if not slots:
+                self.misses += 1
+                return None, 0.0
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            slot = slots[best]
+            self._slots.move_to_end(slot)
+            self.hits += 1
+            return self._slots[slot][2], similarity
+
+    def put(self, scope: Hashable, question: str, embedding: np.ndarray, sql: str):
+        if self.max_entries <= 0:
+            return
+        vector = _normalize(embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry, or the embedding model changed: start over.
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._slots.clear()
+                self._free = list(range(self.max_entries - 1, -1, -1))
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._slots.popitem(last=False)
+            self._vectors[slot] = vector
+            self._slots[slot] = (scope, _numbers(question), sql)
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _numbers(question: str) -> tuple:
+    return tuple(sorted(_NUMBER.findall(question)))
@@ -0,0 +1,68 @@
+import datetime
+import decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+# Incremental responses, sent uncompressed: Starlette's gzip doesn't flush
+# per chunk, so clients would get the stream in large delayed bursts.
+STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serializes query results with orjson. Numpy values, datetimes and
+    dates are handled natively; Decimals (common in Postgres NUMERIC
+    columns) become floats, as FastAPI's default encoder does.
+    """
+    return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+
+def _default(value: Any):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Routes return it directly so the
+    payload also skips FastAPI's much slower jsonable_encoder pass, which
+    otherwise dominates the cost of large result sets.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves streaming media types (NDJSON, SSE) uncompressed."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _StreamingAwareGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class _StreamingAwareGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(STREAMING_MEDIA_TYPES):
+                # The responder passes bodies through untouched when the
+                # response already has an encoding; treat streams the same.
+                self.content_encoding_set = True
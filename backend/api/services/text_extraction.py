@@ -0,0 +1,101 @@
+"""
+Text extraction and chunking for uploaded documents.
+
+Everything here is a plain module-level function over file paths so it can
+run inside a process pool worker: DocumentProcessor farms extraction out
+to worker processes (one task per file, or per page range for long PDFs)
+so CPU-bound parsing neither holds the server's GIL nor serializes a
+batch of uploads behind one another. Text is produced as a stream of
+blocks (pages, paragraphs, lines) and chunked incrementally, so no step
+needs the whole document in memory at once.
+"""
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+import docx
+import pypdf
+
+MAX_CHUNK_CHARS = 1200
+
+
+def iter_text_blocks(
+    file_path: str, page_start: Optional[int] = None, page_stop: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yields a document's text piece by piece (PDF pages, DOCX paragraphs,
+    TXT lines) instead of building one string for the whole file. For
+    PDFs, an optional [page_start, page_stop) range limits the pages read.
+    """
+    file_extension = Path(file_path).suffix.lower()
+    if file_extension == ".pdf":
+        with open(file_path, "rb") as f:
+            reader = pypdf.PdfReader(f)
+            for page in reader.pages[page_start:page_stop]:
+                yield page.extract_text() or ""
+    elif file_extension == ".docx":
+        for para in docx.Document(file_path).paragraphs:
+            yield para.text
+    elif file_extension == ".txt":
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                yield line.rstrip("\n")
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def pdf_page_count(file_path: str) -> int:
+    with open(file_path, "rb") as f:
+        return len(pypdf.PdfReader(f).pages)
+
+
+def extract_chunks(
+    file_path: str, page_start: Optional[int] = None, page_stop: Optional[int] = None
+) -> List[str]:
+    """Extracts and chunks one file (or one page range of a PDF) in a single worker call."""
+    return list(iter_chunks(iter_text_blocks(file_path, page_start, page_stop)))
+
+
+def iter_chunks(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Groups paragraphs into chunks up to MAX_CHUNK_CHARS so embedding
+    requests stay small while preserving paragraph boundaries. Consumes
+    text blocks lazily, so memory is bounded by one chunk rather than the
+    whole document.
+    """
+    buffer = ""
+    for paragraph in _iter_paragraphs(blocks):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        candidate = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if len(candidate) <= MAX_CHUNK_CHARS:
+            buffer = candidate
+        else:
+            if buffer:
+                yield buffer
+            buffer = paragraph
+    if buffer:
+        yield buffer
+
+
+def _iter_paragraphs(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Re-splits a stream of newline-joined blocks on blank lines. Text that
+    runs longer than MAX_CHUNK_CHARS without a blank line is cut at the
+    last line break (or hard at the limit) so it can't grow unbounded.
+    """
+    pending = None
+    for block in blocks:
+        pending = block if pending is None else f"{pending}\n{block}"
+        *paragraphs, pending = pending.split("\n\n")
+        yield from paragraphs
+        # Only a paragraph that is already over the limit gets cut, so text
+        # with normal paragraph breaks chunks exactly as before.
+        while len(pending.strip()) > MAX_CHUNK_CHARS:
+            cut = pending.rfind("\n", 0, MAX_CHUNK_CHARS)
+            if cut <= 0:
+                cut = MAX_CHUNK_CHARS
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
@@ -0,0 +1,433 @@
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+# Storage precisions for the scanned matrix. float16 halves memory; int8
+# (with one float32 scale per vector) quarters it.
+PRECISIONS = ("float32", "float16", "int8")
+# Quantized rows are dequantized to float32 in blocks of this many rows
+# while scoring, so a scan never materializes a full-precision copy.
+SCORE_BLOCK_ROWS = 8192
+# When rescoring, this many candidates per requested result are taken
+# from the quantized scan and re-ranked with the exact float32 vectors.
+RESCORE_CANDIDATES_PER_RESULT = 10
+
+
+class VectorIndex:
+    """
+    In-memory store for document chunk embeddings.
+
+    Vectors live in one contiguous matrix (doubling in capacity as it
+    fills, so appends are amortized O(1)) and are L2-normalized once at
+    insert time. Chunk text and source file name are kept in parallel lists
+    indexed by row, so a search is a single matrix-vector product plus an
+    argpartition over the scores, with no per-query copying of the corpus.
+
+    ``precision`` selects how the matrix is stored: float32, float16, or
+    int8 codes with a per-vector scale. Quantized stores score directly on
+    the compact matrix; when a full-precision copy is available (see
+    MemmapVectorIndex) and ``rescore`` is on, the best candidates are
+    re-ranked with their exact float32 vectors.
+    """
+
+    def __init__(self, dim: int, precision: str = "float32", rescore: bool = True):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported vector precision '{precision}'. Choose one of: {', '.join(PRECISIONS)}.")
+        self.dim = dim
+        self.precision = precision
+        self.rescore = rescore
+        self._matrix = np.empty((INITIAL_CAPACITY, dim), dtype=precision)
+        self._scales = np.empty(INITIAL_CAPACITY, dtype=np.float32) if precision == "int8" else None
+        self._size = 0
+        self._contents: List[str] = []
+        self._sources: List[str] = []
+        # Ingestion runs in a background thread while queries read. Writers
+        # serialize on this lock; readers never take it because rows are
+        # fully written before _size is bumped to expose them.
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, embeddings: np.ndarray, contents: List[str], source: str):
+        """Appends a batch of embeddings (one row per chunk) from a single source file."""
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim))
+        if len(vectors) != len(contents):
+            raise ValueError("Each embedding needs exactly one matching chunk.")
+        if len(vectors) == 0:
+            return
+
+        with self._lock:
+            self._append(vectors, contents, source)
+
+    def search(
+        self, query_embedding: np.ndarray, top_k: int = 3, candidates: Optional[np.ndarray] = None
+    ) -> List[dict]:
+        """
+        Returns the top_k most similar chunks (cosine similarity), best
+        first. When ``candidates`` (an array of row ids) is given, only
+        those rows are scored; this is how an approximate index on top of
+        this one narrows the scan.
+        """
+        size = self._size
+        if size == 0:
+            return []
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        if candidates is not None:
+            candidates = candidates[candidates < size]
+        scores = self._score(query, size, candidates)
+        if len(scores) == 0:
+            return []
+
+        if self.precision != "float32" and self.rescore and self._has_full_precision():
+            pool = _top_positions(scores, top_k * RESCORE_CANDIDATES_PER_RESULT)
+            rows = pool if candidates is None else candidates[pool]
+            exact_scores = self._full_precision_rows(rows) @ query
+            best = _top_positions(exact_scores, top_k)
+            rows, similarities = rows[best], exact_scores[best]
+        else:
+            best = _top_positions(scores, top_k)
+            rows = best if candidates is None else candidates[best]
+            similarities = scores[best]
+
+        results = []
+        for row, similarity in zip(rows, similarities):
+            content, source = self._chunk(int(row))
+            results.append({"content": content, "source": source, "similarity": float(similarity)})
+        return results
+
+    def vectors(self) -> np.ndarray:
+        """
+        View of every stored embedding in the index's storage precision,
+        one row per chunk. Rows are unit-norm up to a positive per-row
+        scale (int8), which doesn't change which vector a row is closest to.
+        """
+        return self._rows(self._size)
+
+    def stats(self) -> dict:
+        size = self._size
+        scan_bytes = self._rows(size).nbytes + (size * 4 if self.precision == "int8" else 0)
+        return {
+            "vectors": size,
+            "dim": self.dim,
+            "precision": self.precision,
+            "rescore": self.rescore and self.precision != "float32" and self._has_full_precision(),
+            "vector_bytes": int(scan_bytes),
+            "bytes_per_vector": round(scan_bytes / size, 1) if size else 0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._matrix = np.empty((INITIAL_CAPACITY, self.dim), dtype=self.precision)
+            if self._scales is not None:
+                self._scales = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+            self._contents = []
+            self._sources = []
+            self._size = 0
+
+    def _score(self, query: np.ndarray, size: int, candidates: Optional[np.ndarray]) -> np.ndarray:
+        codes = self._rows(size)
+        scales = self._scale_rows(size)
+        if candidates is not None:
+            codes = codes[candidates]
+            scales = scales[candidates] if scales is not None else None
+        if codes.dtype == np.float32:
+            return codes @ query
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start : start + SCORE_BLOCK_ROWS]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    # ---- storage hooks (overridden by MemmapVectorIndex) ----
+
+    def _append(self, vectors: np.ndarray, contents: List[str], source: str):
+        end = self._size + len(vectors)
+        if end > len(self._matrix):
+            self._grow(end)
+        codes, scales = _quantize(vectors, self.precision)
+        self._matrix[self._size : end] = codes
+        if scales is not None:
+            self._scales[self._size : end] = scales
+        self._contents.extend(contents)
+        self._sources.extend([source] * len(contents))
+        self._size = end
+
+    def _rows(self, size: int) -> np.ndarray:
+        return self._matrix[:size]
+
+    def _scale_rows(self, size: int) -> Optional[np.ndarray]:
+        return self._scales[:size] if self._scales is not None else None
+
+    def _has_full_precision(self) -> bool:
+        # Only the on-disk store keeps float32 vectors alongside quantized ones.
+        return self.precision == "float32"
+
+    def _full_precision_rows(self, rows: np.ndarray) -> np.ndarray:
+        return self._matrix[rows]
+
+    def _chunk(self, index: int) -> Tuple[str, str]:
+        return self._contents[index], self._sources[index]
+
+    def _grow(self, min_rows: int):
+        capacity = len(self._matrix)
+        while capacity < min_rows:
+            capacity *= 2
+        grown = np.empty((capacity, self.dim), dtype=self.precision)
+        grown[: self._size] = self._matrix[: self._size]
+        if self._scales is not None:
+            grown_scales = np.empty(capacity, dtype=np.float32)
+            grown_scales[: self._size] = self._scales[: self._size]
+            self._scales = grown_scales
+        # Swap in the new matrix only once it holds every existing row, so a
+        # concurrent search still reading the old one sees consistent data.
+        self._matrix = grown
+
+
+class MemmapVectorIndex(VectorIndex):
+    """
+    On-disk variant of VectorIndex that survives restarts.
+
+    Layout inside ``directory``:
+      embeddings.f32  raw float32 rows (already normalized), opened with np.memmap
+      embeddings.f16  float16 copy, only when precision="float16"
+      embeddings.i8   int8 codes plus scales.f32, only when precision="int8"
+      chunks.jsonl    one {"content", "source"} record per row
+      offsets.i64     (byte offset, byte length) of each row's record in chunks.jsonl
+      manifest.json   committed row count plus the model/dim the vectors came from
+
+    Opening the store only reads the manifest and maps the files, so
+    startup time and resident memory don't grow with the corpus; the OS
+    pages vectors in on demand and chunk text is read back only for the
+    rows a search actually returns. Each batch is appended and fsynced
+    before the manifest's row count is advanced, so a crash mid-write
+    just loses that batch.
+
+    With a quantized precision, searches scan the compact file and rescore
+    the best candidates from embeddings.f32, so only a few full-precision
+    rows are touched per query.
+    """
+
+    def __init__(self, dim: int, directory: str, model: str, precision: str = "float32", rescore: bool = True):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported vector precision '{precision}'. Choose one of: {', '.join(PRECISIONS)}.")
+        self.dim = dim
+        self.precision = precision
+        self.rescore = rescore
+        self.directory = directory
+        self.model = model
+        self._lock = threading.Lock()
+        self._size = 0
+        self._chunks_bytes = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._embeddings_path = os.path.join(directory, "embeddings.f32")
+        self._codes_path = os.path.join(directory, "embeddings.f16" if precision == "float16" else "embeddings.i8")
+        self._scales_path = os.path.join(directory, "scales.f32")
+        self._chunks_path = os.path.join(directory, "chunks.jsonl")
+        self._offsets_path = os.path.join(directory, "offsets.i64")
+        self._manifest_path = os.path.join(directory, "manifest.json")
+
+        manifest = self._read_manifest()
+        if manifest and (manifest.get("dim") != dim or manifest.get("model") != model):
+            # Vectors from a different embedding model/dimension aren't
+            # comparable with new queries, so start a fresh store.
+            print(f"Vector store at {directory} was built with a different embedding model; resetting it.")
+            manifest = None
+        if manifest:
+            self._size = int(manifest["count"])
+            self._chunks_bytes = int(manifest["chunks_bytes"])
+        self._truncate_to_committed()
+        self._write_manifest()
+        self._remap(self._size)
+        self._chunks_fd = os.open(self._chunks_path, os.O_RDONLY)
+        self._retired_fds: List[int] = []
+        if self._size:
+            print(f"Opened vector store at {directory} with {self._size} chunks.")
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._chunks_bytes = 0
+            self._write_manifest()
+            # A search may still be reading through memmaps of the current
+            # files, and truncating a mapped file turns those reads into
+            # SIGBUS. Empty files are swapped in under the same names
+            # instead; the old ones live on until their last view is gone.
+            for path in self._data_paths():
+                tmp_path = path + ".tmp"
+                open(tmp_path, "wb").close()
+                os.replace(tmp_path, path)
+            self._remap(0)
+            # Same for the chunk text: an in-flight search may pread the old
+            # descriptor, so it's only closed on the next clear.
+            for fd in self._retired_fds:
+                os.close(fd)
+            self._retired_fds = [self._chunks_fd]
+            self._chunks_fd = os.open(self._chunks_path, os.O_RDONLY)
+
+    def _data_paths(self) -> List[str]:
+        paths = [self._embeddings_path, self._chunks_path, self._offsets_path]
+        if self.precision != "float32":
+            paths.append(self._codes_path)
+        if self.precision == "int8":
+            paths.append(self._scales_path)
+        return paths
+
+    def _append(self, vectors: np.ndarray, contents: List[str], source: str):
+        records = [
+            (json.dumps({"content": c, "source": source}, ensure_ascii=False) + "\n").encode("utf-8")
+            for c in contents
+        ]
+        offsets = np.empty((len(records), 2), dtype=np.int64)
+        position = self._chunks_bytes
+        for i, record in enumerate(records):
+            offsets[i] = (position, len(record) - 1)
+            position += len(record)
+
+        _append_and_sync(self._embeddings_path, vectors.astype(np.float32, copy=False).tobytes())
+        if self.precision != "float32":
+            codes, scales = _quantize(vectors, self.precision)
+            _append_and_sync(self._codes_path, codes.tobytes())
+            if scales is not None:
+                _append_and_sync(self._scales_path, scales.tobytes())
+        _append_and_sync(self._chunks_path, b"".join(records))
+        _append_and_sync(self._offsets_path, offsets.tobytes())
+
+        new_size = self._size + len(vectors)
+        self._chunks_bytes = position
+        self._remap(new_size)
+        self._size = new_size
+        self._write_manifest()
+
+    def _rows(self, size: int) -> np.ndarray:
+        return (self._matrix if self._codes is None else self._codes)[:size]
+
+    def _has_full_precision(self) -> bool:
+        return True
+
+    def _chunk(self, index: int) -> Tuple[str, str]:
+        offset, length = self._offsets[index]
+        record = json.loads(os.pread(self._chunks_fd, int(length), int(offset)).decode("utf-8"))
+        return record["content"], record["source"]
+
+    def _remap(self, size: int):
+        quantized = self.precision != "float32"
+        if size == 0:
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+            self._codes = np.empty((0, self.dim), dtype=self.precision) if quantized else None
+            self._scales = np.empty(0, dtype=np.float32) if self.precision == "int8" else None
+            self._offsets = np.empty((0, 2), dtype=np.int64)
+            return
+        self._matrix = np.memmap(self._embeddings_path, dtype=np.float32, mode="r", shape=(size, self.dim))
+        if quantized:
+            self._codes = np.memmap(self._codes_path, dtype=self.precision, mode="r", shape=(size, self.dim))
+        if self.precision == "int8":
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(size,))
+        self._offsets = np.memmap(self._offsets_path, dtype=np.int64, mode="r", shape=(size, 2))
+
+    def _truncate_to_committed(self):
+        """Drops any bytes written past the manifest's count (e.g. by a crash mid-append)."""
+        sizes = {
+            self._embeddings_path: self._size * self.dim * 4,
+            self._chunks_path: self._chunks_bytes,
+            self._offsets_path: self._size * 2 * 8,
+        }
+        for path, size in sizes.items():
+            with open(path, "ab") as f:
+                f.truncate(size)
+        if self.precision != "float32":
+            self._sync_quantized_files()
+
+    def _sync_quantized_files(self):
+        """
+        Makes the quantized copy match embeddings.f32 row for row. It is
+        only rebuilt (streamed in blocks from the float32 file) when it's
+        missing or short, e.g. on the first start after switching precision.
+        """
+        expected = {self._codes_path: self._size * self.dim * np.dtype(self.precision).itemsize}
+        if self.precision == "int8":
+            expected[self._scales_path] = self._size * 4
+        if all(os.path.exists(path) and os.path.getsize(path) >= size for path, size in expected.items()):
+            for path, size in expected.items():
+                with open(path, "ab") as f:
+                    f.truncate(size)
+            return
+
+        for path in expected:
+            open(path, "wb").close()
+        if not self._size:
+            return
+        print(f"Building {self.precision} copy of the vector store at {self.directory}.")
+        source = np.memmap(self._embeddings_path, dtype=np.float32, mode="r", shape=(self._size, self.dim))
+        for start in range(0, self._size, SCORE_BLOCK_ROWS):
+            codes, scales = _quantize(np.asarray(source[start : start + SCORE_BLOCK_ROWS]), self.precision)
+            _append_and_sync(self._codes_path, codes.tobytes())
+            if scales is not None:
+                _append_and_sync(self._scales_path, scales.tobytes())
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        manifest = {
+            "dim": self.dim,
+            "model": self.model,
+            "count": self._size,
+            "chunks_bytes": self._chunks_bytes,
+        }
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+
+def _quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encodes normalized float32 rows; int8 also returns each row's dequantization scale."""
+    if precision == "float32":
+        return vectors, None
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0 + 1e-12
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _top_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k < len(scores):
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(scores[top])[::-1]]
+
+
+def _append_and_sync(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / (norms + 1e-10)
@@ -0,0 +1,64 @@
+"""
+Benchmark: memory footprint, recall@k and latency of float16 / int8
+vector storage (with and without float32 rescoring) against the
+full-precision VectorIndex, on synthetic clustered embeddings. Run from
+the backend/ directory with:
+
+    python -m benchmarks.quantization_recall --chunks 100000 --dim 768
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from api.services.vector_index import MemmapVectorIndex, VectorIndex
+
+from .ann_recall import clustered_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    data = clustered_embeddings(rng, args.chunks, args.dim, clusters=max(8, args.chunks // 500))
+    queries = data[rng.choice(args.chunks, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    labels = [str(i) for i in range(args.chunks)]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        variants = {
+            "float32": VectorIndex(args.dim),
+            "float16": VectorIndex(args.dim, "float16"),
+            "int8": VectorIndex(args.dim, "int8"),
+            "float16 + rescore": MemmapVectorIndex(args.dim, f"{scratch}/f16", "bench", "float16"),
+            "int8 + rescore": MemmapVectorIndex(args.dim, f"{scratch}/i8", "bench", "int8"),
+        }
+        for index in variants.values():
+            for start in range(0, args.chunks, 10_000):
+                index.add(data[start : start + 10_000], labels[start : start + 10_000], "bench")
+
+        exact = variants["float32"]
+        truth = [{r["content"] for r in exact.search(q, args.k)} for q in queries]
+
+        print(f"{args.chunks} chunks, dim={args.dim}, {args.queries} queries\n")
+        print(f"{'storage':<18}  {'scan MB':>8}  {'B/vector':>8}  {'recall@' + str(args.k):>10}  {'ms/query':>9}")
+        for name, index in variants.items():
+            started = time.perf_counter()
+            found = [{r["content"] for r in index.search(q, args.k)} for q in queries]
+            ms = (time.perf_counter() - started) * 1000 / args.queries
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            stats = index.stats()
+            print(
+                f"{name:<18}  {stats['vector_bytes'] / 1e6:>8.1f}  {stats['bytes_per_vector']:>8.0f}"
+                f"  {recall:>10.3f}  {ms:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
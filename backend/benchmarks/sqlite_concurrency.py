@@ -0,0 +1,137 @@
+"""
+Benchmark: query throughput and latency on an uploaded-files SQLite
+database while it sits idle and while a large CSV upload is being
+bulk-loaded into it, using concurrent reader threads the way the SQL
+executor runs queries (no API key or network needed). Run from the
+backend/ directory with:
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --upload-rows 2000000
+
+Pass --rollback-journal to switch the file back to SQLite's default
+journal mode for comparison; readers then wait on (or fail with "database
+is locked" behind) every write commit.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from api.services.datasources.upload_source import SQLiteUploadDataSource
+
+QUERIES = (
+    "SELECT region, COUNT(*) AS n, AVG(amount) AS avg_amount FROM sales GROUP BY region",
+    "SELECT * FROM sales WHERE customer_id = 4242",
+    "SELECT customer_id, SUM(amount) AS total FROM sales GROUP BY customer_id ORDER BY total DESC LIMIT 10",
+)
+
+
+def write_csv(path: str, rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "customer_id": rng.integers(0, 50_000, rows),
+            "region": rng.choice(["north", "south", "east", "west"], rows),
+            "amount": rng.random(rows).round(2) * 1000,
+        }
+    )
+    frame.to_csv(path, index=False)
+
+
+def run_readers(source: SQLiteUploadDataSource, readers: int, stop: threading.Event) -> tuple:
+    """
+    Starts ``readers`` threads running QUERIES round-robin until ``stop``
+    is set. Returns (threads, latencies); latencies fills in as they exit.
+    """
+    latencies: list = []
+    lock = threading.Lock()
+
+    def reader(offset: int):
+        local = []
+        i = offset
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                source.execute(QUERIES[i % len(QUERIES)])
+                local.append(time.perf_counter() - started)
+            except Exception:
+                local.append(None)
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for thread in threads:
+        thread.start()
+    return threads, latencies
+
+
+def report(label: str, latencies: list, seconds: float):
+    ms = np.array([latency for latency in latencies if latency is not None]) * 1000
+    failed = len(latencies) - len(ms)
+    if not len(ms):
+        print(f"{label:<16}  {0:>9.1f}  {'-':>8}  {'-':>8}  {'-':>8}  {failed:>6}")
+        return
+    print(
+        f"{label:<16}  {len(ms) / seconds:>9.1f}  {np.percentile(ms, 50):>8.1f}  "
+        f"{np.percentile(ms, 95):>8.1f}  {ms.max():>8.1f}  {failed:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--base-rows", type=int, default=200_000)
+    parser.add_argument("--upload-rows", type=int, default=2_000_000)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--rollback-journal", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        base_csv = os.path.join(scratch, "sales.csv")
+        upload_csv = os.path.join(scratch, "events.csv")
+        write_csv(base_csv, args.base_rows, seed=1)
+        write_csv(upload_csv, args.upload_rows, seed=2)
+
+        source = SQLiteUploadDataSource()
+        if args.rollback_journal:
+            with source._write_engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA journal_mode=DELETE")
+        source.load_file(base_csv)
+        journal = "rollback journal" if args.rollback_journal else "WAL"
+        print(f"{args.base_rows} queried rows, {args.readers} reader threads, {journal}\n")
+        print(f"{'phase':<16}  {'queries/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'max ms':>8}  {'failed':>6}")
+
+        stop = threading.Event()
+        threads, latencies = run_readers(source, args.readers, stop)
+        time.sleep(args.idle_seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        report("idle", latencies, args.idle_seconds)
+
+        stop = threading.Event()
+        threads, latencies = run_readers(source, args.readers, stop)
+        started = time.perf_counter()
+        loaded = source.load_file(upload_csv)
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+        report("during upload", latencies, upload_seconds)
+
+        rows = sum(table["rows"] for table in loaded)
+        print(f"\nUpload of {rows} rows took {upload_seconds:.1f}s ({rows / upload_seconds:,.0f} rows/s) under read load")
+        source._engine.dispose()
+        source._write_engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(source.db_path + suffix):
+                os.remove(source.db_path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,12 +11,18 @@ load_dotenv()
 
 from api.routes import datasource, ingestion, query, schema  # noqa: E402  (import after load_dotenv on purpose)
 from api.services.engine_manager import init_engine_manager  # noqa: E402
+from api.services.serialization import StreamingAwareGZipMiddleware  # noqa: E402
 
 # Directory containing the built React frontend (created by the Docker
 # build). When absent (e.g. running the backend alone during local
 # development), the API still works; only static serving is skipped.
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 
+# Responses at least this big are gzipped for clients that accept it;
+# query results are repetitive JSON and compress several-fold. Streamed
+# NDJSON is left uncompressed so rows reach the client as they're sent.
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -42,6 +48,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
 app.include_router(datasource.router, prefix="/api/datasource", tags=["Data Source"])
 app.include_router(ingestion.router, prefix="/api", tags=["Ingestion"])
 app.include_router(query.router, prefix="/api", tags=["Query"])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports itself as the top-level ``api`` package (run from backend/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
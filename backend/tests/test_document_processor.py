@@ -0,0 +1,48 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from api.services import document_processor
+
+
+def test_extraction_pool_fits_available_memory(monkeypatch):
+    monkeypatch.setattr(document_processor.os, "cpu_count", lambda: 8)
+
+    monkeypatch.setattr(document_processor, "memory_limit_bytes", lambda: 512 * 1024 * 1024)
+    assert document_processor._default_extraction_workers() == 0
+
+    monkeypatch.setattr(document_processor, "memory_limit_bytes", lambda: 16 * 1024**3)
+    assert document_processor._default_extraction_workers() == 2
+
+    monkeypatch.setattr(document_processor, "memory_limit_bytes", lambda: None)
+    assert document_processor._default_extraction_workers() == 2
+
+
+class _DeadPool:
+    """An executor whose worker has already died."""
+
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_extraction_pool_is_replaced(tmp_path):
+    processor = document_processor.DocumentProcessor.__new__(document_processor.DocumentProcessor)
+    processor.client = object()
+    dead = processor._executor = _DeadPool()
+    path = tmp_path / "report.docx"
+    path.write_bytes(b"")
+    statuses, progress = {}, {}
+
+    processor.process_documents([str(path)], "job", statuses, progress)
+
+    assert statuses["job"].startswith("Failed: an extraction worker exited")
+    assert progress["report.docx"]["status"].startswith("Failed")
+    assert dead.shut_down
+    assert processor._executor is None
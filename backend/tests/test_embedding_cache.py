@@ -0,0 +1,52 @@
+import numpy as np
+
+from api.services.embedding_cache import EmbeddingCache
+
+
+def _key(text: str) -> bytes:
+    return EmbeddingCache.make_key(text, "model", 3, "RETRIEVAL_DOCUMENT")
+
+
+def _vector(value: float) -> np.ndarray:
+    return np.full(3, value, dtype=np.float32)
+
+
+def test_keys_cover_model_dimension_and_task():
+    key = EmbeddingCache.make_key("text", "model", 3, "RETRIEVAL_DOCUMENT")
+    assert key != EmbeddingCache.make_key("text", "model", 3, "RETRIEVAL_QUERY")
+    assert key != EmbeddingCache.make_key("text", "model", 768, "RETRIEVAL_DOCUMENT")
+    assert key != EmbeddingCache.make_key("text", "other", 3, "RETRIEVAL_DOCUMENT")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=2)
+    cache.put_many({_key("a"): _vector(1), _key("b"): _vector(2)})
+    # Reading "a" makes "b" the least recently used.
+    assert list(cache.get_many([_key("a")])) == [_key("a")]
+    cache.put_many({_key("c"): _vector(3)})
+
+    found = cache.get_many([_key("a"), _key("b"), _key("c")])
+    assert set(found) == {_key("a"), _key("c")}
+    assert np.array_equal(found[_key("c")], _vector(3))
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 1
+
+
+def test_duplicate_puts_are_not_counted_twice(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=2)
+    cache.put_many({_key("a"): _vector(1)})
+    cache.put_many({_key("a"): _vector(1), _key("b"): _vector(2)})
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 0
+
+
+def test_entries_and_recency_survive_reopening(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(path, max_entries=2)
+    cache.put_many({_key("a"): _vector(1)})
+    cache.put_many({_key("b"): _vector(2)})
+    cache.get_many([_key("a")])
+
+    reopened = EmbeddingCache(path, max_entries=2)
+    reopened.put_many({_key("c"): _vector(3)})
+    assert set(reopened.get_many([_key("a"), _key("b"), _key("c")])) == {_key("a"), _key("c")}
@@ -0,0 +1,100 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from google.genai import errors
+
+from api.services import embedding_dispatcher
+from api.services.embedding_dispatcher import EmbeddingDispatcher, TokenBucket
+
+
+# A power of two per second, so the fake clock's arithmetic stays exact.
+REQUESTS_PER_MINUTE = 60 * 64
+
+
+class _Clock:
+    """Stands in for the time module: sleeping just advances the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(embedding_dispatcher, "time", clock)
+    return clock
+
+
+def _api_error(code: int) -> errors.APIError:
+    return errors.APIError(code, {"error": {"code": code, "message": "error", "status": "ERROR"}})
+
+
+class _FlakyModels:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def embed_content(self, model, contents, config):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(text))]) for text in contents])
+
+
+def test_token_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate_per_second=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 10  # idle time refills up to capacity only
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_retryable_errors_back_off_exponentially(clock, monkeypatch):
+    monkeypatch.setattr(embedding_dispatcher.random, "uniform", lambda low, high: high)
+    models = _FlakyModels([_api_error(429), _api_error(503), _api_error(500)])
+    dispatcher = EmbeddingDispatcher(SimpleNamespace(models=models), requests_per_minute=REQUESTS_PER_MINUTE, max_retries=5)
+
+    [vectors] = dispatcher.embed_batches([["ab", "abc"]], "model", None)
+
+    assert [v.tolist() for v in vectors] == [[2.0], [3.0]]
+    assert models.calls == 4
+    backoffs = [s for s in clock.sleeps if s >= embedding_dispatcher.BACKOFF_BASE_SECONDS]
+    assert backoffs == [1.0, 2.0, 4.0]
+    assert dispatcher.stats()["retries"] == 3
+
+
+def test_client_errors_and_exhausted_retries_are_raised(clock):
+    models = _FlakyModels([_api_error(400)])
+    dispatcher = EmbeddingDispatcher(SimpleNamespace(models=models), requests_per_minute=REQUESTS_PER_MINUTE)
+    with pytest.raises(errors.APIError):
+        dispatcher.embed_batches([["a"]], "model", None)
+    assert models.calls == 1
+
+    models = _FlakyModels([_api_error(429)] * 3)
+    dispatcher = EmbeddingDispatcher(SimpleNamespace(models=models), requests_per_minute=REQUESTS_PER_MINUTE, max_retries=2)
+    with pytest.raises(errors.APIError):
+        dispatcher.embed_batches([["a"]], "model", None)
+    assert models.calls == 3
+
+
+def test_results_keep_batch_order(clock):
+    models = _FlakyModels([])
+    dispatcher = EmbeddingDispatcher(SimpleNamespace(models=models), max_concurrency=4, requests_per_minute=REQUESTS_PER_MINUTE)
+    batches = [["x" * n] for n in range(1, 9)]
+    results = dispatcher.embed_batches(batches, "model", None)
+    assert [float(batch[0][0]) for batch in results] == [float(n) for n in range(1, 9)]
+    assert all(isinstance(batch[0], np.ndarray) for batch in results)
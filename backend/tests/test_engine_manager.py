@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from api.services.engine_manager import EngineManager
+
+
+class _BrokenUploads:
+    def load_files(self, paths, progress):
+        progress["sales.csv"] = {"status": "In Progress", "rows": 100}
+        raise RuntimeError("database is locked")
+
+
+def test_structured_load_errors_fail_the_job(tmp_path):
+    manager = EngineManager.__new__(EngineManager)
+    manager.upload_datasource = _BrokenUploads()
+    manager.document_processor = SimpleNamespace()
+    manager.mode = None
+    manager.activate_uploads = lambda: None
+    path = tmp_path / "sales.csv"
+    path.write_text("a\n1\n")
+    statuses, details = {}, {}
+
+    manager.process_uploaded_batch([str(path)], "job", statuses, details)
+
+    assert statuses["job"] == "Failed: Could not load structured files: database is locked"
+    assert details["job"]["files"]["sales.csv"]["status"] == "Failed: database is locked"
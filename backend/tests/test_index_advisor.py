@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from api.services import index_advisor
+from api.services.datasources.upload_source import SQLiteUploadDataSource
+from api.services.index_advisor import _PLAN_SCAN, id_like_columns, parse_column_references
+
+
+def test_aliases_resolve_to_their_tables():
+    aliases, references = parse_column_references(
+        "SELECT c.name, SUM(o.amount) FROM customers AS c JOIN orders o ON o.customer_id = c.id "
+        "WHERE c.region = 'north' GROUP BY c.name"
+    )
+    assert aliases == {"customers": "customers", "c": "customers", "orders": "orders", "o": "orders"}
+    assert references == {("o", "customer_id"), ("c", "id"), ("c", "region"), ("c", "name")}
+
+
+def test_select_list_and_string_literals_are_ignored():
+    _, references = parse_column_references(
+        "SELECT amount, note FROM t WHERE name = 'WHERE city = 1' AND lower(city) = 'a'"
+    )
+    assert references == {(None, "name"), (None, "city")}
+
+
+def test_subqueries_and_ctes_are_scanned():
+    aliases, references = parse_column_references(
+        "WITH big AS (SELECT customer_id FROM orders WHERE amount > 100) "
+        "SELECT * FROM customers WHERE id IN (SELECT customer_id FROM big WHERE region = 'x') AND status = 'open'"
+    )
+    assert {"orders", "customers", "big"} <= set(aliases.values())
+    assert references == {(None, "amount"), (None, "region"), (None, "id"), (None, "status")}
+
+
+def test_quoted_identifiers():
+    aliases, references = parse_column_references(
+        'SELECT * FROM main."Order Items" AS oi WHERE "Product ID" = 3 AND oi."Unit ""Net"" Price" > 2 '
+        "AND [Ship Date] > '2025-01-01' AND `Status` = 'x'"
+    )
+    assert aliases == {"order items": "order items", "oi": "order items"}
+    assert references == {(None, "product id"), ("oi", 'unit "net" price'), (None, "ship date"), (None, "status")}
+
+
+def test_comma_joins_register_every_table():
+    aliases, references = parse_column_references("SELECT * FROM a, b AS bee WHERE a.x = bee.y")
+    assert aliases == {"a": "a", "b": "b", "bee": "b"}
+    assert references == {("a", "x"), ("bee", "y")}
+
+
+@pytest.mark.parametrize(
+    "detail, table",
+    [
+        ("SCAN orders", "orders"),
+        ("SCAN TABLE orders", "orders"),
+        ("SEARCH o USING AUTOMATIC COVERING INDEX (customer_id=?)", "o"),
+        ("SEARCH orders USING INDEX ix_orders_id (id=?)", None),
+        ("USE TEMP B-TREE FOR ORDER BY", None),
+    ],
+)
+def test_plan_scan_regex(detail, table):
+    match = _PLAN_SCAN.match(detail)
+    assert (match and (match.group(1) or match.group(2))) == table
+
+
+def test_id_like_columns_need_an_id_name_and_mostly_distinct_values():
+    chunk = pd.DataFrame(
+        {
+            "Customer ID": range(100),
+            "orderId": range(100),
+            "region_code": ["n", "s"] * 50,
+            "amount": range(100),
+            "price_id": [0.5] * 100,
+        }
+    )
+    columns = ["customer_id", "orderid", "region_code", "amount", "price_id"]
+    assert id_like_columns(chunk, columns) == ["customer_id", "orderid"]
+
+
+def _load(tmp_path, rows: int) -> SQLiteUploadDataSource:
+    path = tmp_path / "orders.csv"
+    pd.DataFrame({"city": [f"c{i % 7}" for i in range(rows)], "amount": range(rows)}).to_csv(path, index=False)
+    source = SQLiteUploadDataSource()
+    source.load_file(str(path))
+    return source
+
+
+def test_small_tables_are_not_indexed(tmp_path):
+    source = _load(tmp_path, 50)
+    advisor = source.index_advisor
+    for _ in range(index_advisor.INDEX_ADVISOR_MIN_USES + 1):
+        advisor._observe("SELECT * FROM orders WHERE city = 'c1'")
+    assert advisor.indexes_created == []
+
+
+def test_repeatedly_scanned_columns_are_indexed(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_advisor, "INDEX_MIN_ROWS", 10)
+    source = _load(tmp_path, 50)
+    advisor = source.index_advisor
+    advisor._observe("SELECT * FROM orders WHERE city = 'c1'")
+    assert advisor.indexes_created == []
+    advisor._observe("SELECT * FROM orders o WHERE o.city = 'c2'")
+    assert advisor.indexes_created == ["ix_orders_city"]
+    # Now an index lookup, not a scan, so it isn't counted towards amount.
+    advisor._observe("SELECT * FROM orders WHERE city = 'c3' AND amount > 5")
+    advisor._observe("SELECT * FROM orders WHERE city = 'c3' AND amount > 5")
+    assert advisor.indexes_created == ["ix_orders_city"]
@@ -0,0 +1,53 @@
+import numpy as np
+
+from api.services.ivf_index import IVFIndex, _nearest_centroids, _spherical_kmeans
+from api.services.vector_index import VectorIndex
+
+
+def _clustered(rng, centers: np.ndarray, per_center: int) -> np.ndarray:
+    noise = rng.normal(scale=0.05, size=(len(centers) * per_center, centers.shape[1]))
+    points = np.repeat(centers, per_center, axis=0) + noise
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_nearest_centroids_picks_the_most_similar():
+    centroids = np.eye(3, dtype=np.float32)
+    vectors = np.array([[0.9, 0.1, 0], [0, 0.2, 0.8], [0.1, 0.7, 0.1]], dtype=np.float32)
+    assert _nearest_centroids(vectors, centroids).tolist() == [0, 2, 1]
+
+
+def test_spherical_kmeans_lists_do_not_mix_separated_clusters():
+    rng = np.random.default_rng(0)
+    points = _clustered(rng, np.eye(4, dtype=np.float32), 50)
+    centroids = _spherical_kmeans(points, 16, np.random.default_rng(1))
+    assert centroids.shape == (16, 4)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1, atol=1e-5)
+    assignments = _nearest_centroids(points, centroids).reshape(4, 50)
+    lists_per_cluster = [set(row) for row in assignments.tolist()]
+    for i, lists in enumerate(lists_per_cluster):
+        assert not any(lists & other for other in lists_per_cluster[i + 1 :])
+
+
+def test_small_stores_stay_exact():
+    index = IVFIndex(VectorIndex(4), min_train_size=100)
+    index.add(np.eye(4, dtype=np.float32), ["a", "b", "c", "d"], "doc")
+    assert not index.is_trained()
+    assert index.search(np.array([0, 0, 1, 0], dtype=np.float32), top_k=1)[0]["content"] == "c"
+
+
+def test_rows_added_after_training_are_assigned_and_found():
+    rng = np.random.default_rng(0)
+    dim = 8
+    index = IVFIndex(VectorIndex(dim), nprobe=2, min_train_size=200)
+    first = _clustered(rng, np.eye(dim, dtype=np.float32), 40)
+    index.add(first, [f"row {i}" for i in range(len(first))], "doc")
+    assert index.is_trained()
+    lists = index._state[1]
+    assert sum(len(rows) for rows in lists) == len(first)
+
+    target = np.zeros(dim, dtype=np.float32)
+    target[[2, 5]] = 1 / np.sqrt(2)  # far from every existing row
+    index.add(target[None, :], ["new"], "doc")
+    lists = index._state[1]
+    assert sum(len(rows) for rows in lists) == len(first) + 1
+    assert index.search(target, top_k=1, nprobe=len(lists))[0]["content"] == "new"
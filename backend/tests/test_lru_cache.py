@@ -0,0 +1,70 @@
+import numpy as np
+
+from api.services import lru_cache
+from api.services.lru_cache import LRUCache, approximate_size
+
+
+def test_approximate_size_stops_past_the_limit():
+    rows = [{"id": i, "name": f"row {i}"} for i in range(10_000)]
+    full = approximate_size(rows)
+    partial = approximate_size(rows, limit=10_000)
+    assert 10_000 < partial < full // 10
+
+
+def test_oversize_entry_is_skipped():
+    cache = LRUCache(10, max_entry_bytes=1_000)
+    assert not cache.put("big", ["x" * 100 for _ in range(100)])
+    assert cache.get("big") is None
+    assert cache.stats()["oversize_skips"] == 1
+    assert cache.bytes == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = LRUCache(10, max_bytes=300, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("b", "x" * 100)
+    cache.get("a")
+    cache.put("c", "x" * 150)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 100
+    assert cache.bytes == 250
+    assert cache.stats()["evictions"] == 1
+
+
+def test_replacing_and_clearing_keep_bytes_in_step():
+    cache = LRUCache(10, max_bytes=1_000, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("a", "x" * 40)
+    assert cache.bytes == 40
+    cache.clear()
+    assert cache.bytes == 0 and len(cache) == 0
+
+
+def test_expired_entries_release_their_bytes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+    cache = LRUCache(10, ttl_seconds=5, max_bytes=1_000, sizeof=len)
+    cache.put("a", "x" * 100)
+    cache.put("b", "x" * 100, ttl_seconds=60)
+    now[0] += 10
+    assert cache.get("a") is None
+    assert cache.get("b") == "x" * 100
+    assert cache.bytes == 100
+    assert cache.stats()["expirations"] == 1
+
+
+def test_entry_count_limit_applies_without_byte_limits():
+    cache = LRUCache(2)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") is None and len(cache) == 2
+    assert "bytes" not in cache.stats()
+
+
+def test_shared_and_numpy_values_are_sized_once():
+    shared = "y" * 1_000
+    assert approximate_size([shared, shared]) < 2 * approximate_size(shared)
+    array = np.zeros(1_000, dtype=np.float32)
+    view = array[:500]
+    assert approximate_size(array) >= array.nbytes
+    assert approximate_size(view) >= view.nbytes
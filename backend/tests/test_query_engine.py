@@ -0,0 +1,47 @@
+import asyncio
+import sqlite3
+
+from api.services.datasources.sqlite_source import SQLiteDataSource
+from api.services.query_engine import QueryEngine, _limit_sql
+
+
+def test_limit_sql_survives_trailing_comment():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (n INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?)", ((i,) for i in range(10)))
+    sql = "SELECT n FROM t ORDER BY n -- highest first would be DESC"
+    rows = connection.execute(_limit_sql(sql, 3, offset=2)).fetchall()
+    assert rows == [(2,), (3,), (4,)]
+
+
+class _NoDocuments:
+    vector_store: list = []
+
+    async def embed_query_async(self, text):
+        raise RuntimeError("no embeddings in tests")
+
+
+def make_engine(monkeypatch, tmp_path, generated_sql: str):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    path = str(tmp_path / "data.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE numbers (n INTEGER)")
+    connection.commit()
+    connection.close()
+    engine = QueryEngine(SQLiteDataSource(path), _NoDocuments())
+
+    async def fake_generate(user_query, schema):
+        return generated_sql, {"prompt_tokens": 1}
+
+    monkeypatch.setattr(engine, "_generate_sql", fake_generate)
+    return engine
+
+
+def test_rejected_sql_is_returned_with_the_error(monkeypatch, tmp_path):
+    engine = make_engine(monkeypatch, tmp_path, "DELETE FROM numbers")
+    response = asyncio.run(engine.process_query("remove all numbers"))
+    assert "Only SELECT" in response["error"]
+    assert response["generated_sql"] == "DELETE FROM numbers"
+
+    page = asyncio.run(engine.process_query_page("remove all numbers", page_size=10))
+    assert page["generated_sql"] == "DELETE FROM numbers"
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import query
+from api.services.query_engine import ResultExpiredError
+
+
+@pytest.mark.parametrize(
+    "error, status",
+    [(ResultExpiredError("This page token has expired."), 410), (ValueError("could not convert value"), 500)],
+)
+def test_only_expired_pages_are_gone(monkeypatch, error, status):
+    async def process_query_page(*args):
+        raise error
+
+    manager = SimpleNamespace(engine=SimpleNamespace(process_query_page=process_query_page))
+    monkeypatch.setattr(query, "get_engine_manager", lambda: manager)
+    app = FastAPI()
+    app.include_router(query.router, prefix="/api")
+
+    response = TestClient(app).post("/api/query", json={"query": "top customers", "page_token": "abc"})
+    assert response.status_code == status
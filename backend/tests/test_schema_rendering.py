@@ -0,0 +1,35 @@
+from api.services import schema_rendering
+from api.services.schema_retrieval import SchemaRetriever
+
+
+def large_schema(tables: int = 300) -> dict:
+    return {
+        "tables": [
+            {
+                "name": f"table_{i}",
+                "columns": [{"name": "id", "type": "INTEGER"}] + [
+                    {"name": f"field_{i}_{j}", "type": "TEXT"} for j in range(20)
+                ],
+                "foreign_keys": [],
+            }
+            for i in range(tables)
+        ]
+    }
+
+
+def test_selected_schemas_render_without_rehashing(monkeypatch):
+    retriever = SchemaRetriever(large_schema())
+    subset = retriever.select("show field_7_3 of table 7")
+    full = retriever.select("nothing matches this question")
+    assert len(subset["tables"]) < len(full["tables"])
+    assert full["fingerprint"] == retriever.fingerprint
+    assert subset["fingerprint"] not in (full["fingerprint"], None)
+    assert retriever.select("show field_7_3 of table 7")["fingerprint"] == subset["fingerprint"]
+
+    def no_hashing(schema):
+        raise AssertionError("schema was re-hashed")
+
+    monkeypatch.setattr(schema_rendering, "schema_fingerprint", no_hashing)
+    text = schema_rendering.render_schema(subset)
+    assert "table_7(id INTEGER, field_7_0 TEXT" in text
+    assert schema_rendering.render_schema(subset) is text
@@ -0,0 +1,47 @@
+import numpy as np
+
+from api.services.semantic_cache import SemanticSQLCache
+
+SCOPE = ("sqlite", "schema-1")
+
+
+def _vector(*values) -> np.ndarray:
+    return np.array(values, dtype=np.float32)
+
+
+def test_reworded_question_reuses_sql():
+    cache = SemanticSQLCache(threshold=0.9)
+    cache.put(SCOPE, "top 5 customers by revenue", _vector(1, 0.1, 0), "SELECT 5")
+    sql, similarity = cache.lookup(SCOPE, "which 5 customers spent the most", _vector(1, 0.12, 0))
+    assert sql == "SELECT 5"
+    assert similarity > 0.99
+
+
+def test_different_numbers_never_match():
+    cache = SemanticSQLCache(threshold=0.9)
+    cache.put(SCOPE, "top 5 customers by revenue", _vector(1, 0, 0), "SELECT 5")
+    assert cache.lookup(SCOPE, "top 10 customers by revenue", _vector(1, 0, 0))[0] is None
+    assert cache.lookup(SCOPE, "top customers by revenue", _vector(1, 0, 0))[0] is None
+    # Same numbers in another order still match.
+    cache.put(SCOPE, "orders between 2 and 7.5 units", _vector(0, 1, 0), "SELECT range")
+    assert cache.lookup(SCOPE, "orders with 7.5 to 2 units", _vector(0, 1, 0))[0] == "SELECT range"
+
+
+def test_other_scopes_and_dissimilar_questions_miss():
+    cache = SemanticSQLCache(threshold=0.9)
+    cache.put(SCOPE, "total revenue", _vector(1, 0, 0), "SELECT SUM")
+    assert cache.lookup(("postgresql", "schema-1"), "total revenue", _vector(1, 0, 0))[0] is None
+    sql, similarity = cache.lookup(SCOPE, "list employees", _vector(0, 1, 0))
+    assert sql is None and similarity < 0.9
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticSQLCache(max_entries=2, threshold=0.9)
+    cache.put(SCOPE, "a", _vector(1, 0, 0), "A")
+    cache.put(SCOPE, "b", _vector(0, 1, 0), "B")
+    assert cache.lookup(SCOPE, "a", _vector(1, 0, 0))[0] == "A"
+    cache.put(SCOPE, "c", _vector(0, 0, 1), "C")
+    assert len(cache) == 2
+    assert cache.lookup(SCOPE, "b", _vector(0, 1, 0))[0] is None
+    assert cache.lookup(SCOPE, "a", _vector(1, 0, 0))[0] == "A"
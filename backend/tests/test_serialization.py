@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from api.services.serialization import FastJSONResponse, StreamingAwareGZipMiddleware
+
+
+def make_app(release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=10)
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            yield b'{"meta": {}}\n'
+            # The rest only comes once the client has seen the first line.
+            await release.wait()
+            yield b'{"end": {}}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/json")
+    async def json_response():
+        return FastJSONResponse({"rows": [{"value": "x" * 10}] * 100})
+
+    return app
+
+
+async def call(app: FastAPI, path: str, on_message=None) -> list:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"test"), (b"accept-encoding", b"gzip")], "client": ("test", 1), "server": ("test", 80),
+    }
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+        if on_message:
+            on_message(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+def test_ndjson_lines_arrive_before_the_stream_ends():
+    async def scenario():
+        release = asyncio.Event()
+
+        def on_message(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                release.set()
+
+        messages = await asyncio.wait_for(call(make_app(release), "/stream", on_message), timeout=5)
+        start, first_body = messages[0], messages[1]
+        assert b"content-encoding" not in dict(start["headers"])
+        assert first_body["body"] == b'{"meta": {}}\n'
+        assert first_body.get("more_body")
+
+    asyncio.run(scenario())
+
+
+def test_json_responses_are_still_gzipped():
+    messages = asyncio.run(call(make_app(asyncio.Event()), "/json"))
+    assert dict(messages[0]["headers"])[b"content-encoding"] == b"gzip"
@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+import pytest
+
+from api.services.datasources.base import StreamDeadline
+from api.services.datasources import sqlite_source
+from api.services.datasources.sqlite_source import SQLiteDataSource
+
+
+def make_source(tmp_path, rows: int) -> SQLiteDataSource:
+    path = str(tmp_path / "data.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE numbers (n INTEGER)")
+    connection.executemany("INSERT INTO numbers VALUES (?)", ((i,) for i in range(rows)))
+    connection.commit()
+    connection.close()
+    return SQLiteDataSource(path)
+
+
+def test_iter_rows_yields_full_batches(tmp_path):
+    source = make_source(tmp_path, 5000)
+    batches = list(source.iter_rows("SELECT n FROM numbers ORDER BY n", batch_size=2000))
+    assert [len(batch) for batch in batches] == [2000, 2000, 1000]
+    assert batches[0][0] == {"n": 0}
+
+
+def test_stalled_stream_releases_its_connection(tmp_path):
+    source = make_source(tmp_path, 5000)
+    batches = StreamDeadline(source.iter_rows("SELECT n FROM numbers", batch_size=1000), seconds=0.2)
+    assert len(next(batches)) == 1000
+    assert source._engine.pool.checkedout() == 1
+
+    time.sleep(0.5)  # the reader stalls past the deadline
+    assert source._engine.pool.checkedout() == 0
+    with pytest.raises(TimeoutError):
+        next(batches)
+
+
+def test_stream_within_deadline_reads_everything(tmp_path):
+    source = make_source(tmp_path, 5000)
+    batches = StreamDeadline(source.iter_rows("SELECT n FROM numbers", batch_size=1000), seconds=30)
+    assert sum(len(batch) for batch in batches) == 5000
+    assert source._engine.pool.checkedout() == 0
+
+
+def test_read_pool_fits_available_memory(monkeypatch):
+    monkeypatch.setattr(sqlite_source, "memory_limit_bytes", lambda: 512 * 1024 * 1024)
+    assert sqlite_source._default_read_pool_size() == 2
+
+    monkeypatch.setattr(sqlite_source, "memory_limit_bytes", lambda: 16 * 1024**3)
+    assert sqlite_source._default_read_pool_size() == 8
+
+
+def test_query_sorts_do_not_use_memory_temp_storage(tmp_path):
+    source = make_source(tmp_path, 10)
+    assert source.execute("PRAGMA temp_store") == [{"temp_store": 0}]
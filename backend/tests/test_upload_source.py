@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from api.services.datasources.upload_source import SQLiteUploadDataSource, _SerialWriter
+
+
+@pytest.mark.parametrize("write_only", [False, True])  # write-only files carry no dimension record
+def test_xlsx_cells_beyond_the_header_are_kept(tmp_path, write_only):
+    path = str(tmp_path / "wide.xlsx")
+    workbook = Workbook(write_only=write_only)
+    sheet = workbook.create_sheet("Sales") if write_only else workbook.active
+    sheet.title = "Sales"
+    sheet.append(["region", "amount"])
+    sheet.append(["north", 10, "late"])
+    sheet.append(["south", 20, None, 7])
+    workbook.save(path)
+
+    source = SQLiteUploadDataSource()
+    source.load_file(path)
+
+    expected = pd.read_excel(path)
+    assert list(expected.columns) == ["region", "amount", "Unnamed: 2", "Unnamed: 3"]
+    rows = source.execute("SELECT * FROM sales ORDER BY amount")
+    assert rows == [
+        {"region": "north", "amount": 10, "unnamed_2": "late", "unnamed_3": None},
+        {"region": "south", "amount": 20, "unnamed_2": None, "unnamed_3": 7},
+    ]
+
+
+def test_writer_keeps_draining_after_its_connection_breaks():
+    source = SQLiteUploadDataSource()
+    writer = _SerialWriter(source._write_engine, queue_size=1)
+    writer._connection.driver_connection.close()
+
+    writer.create_table("t", '"n" INTEGER', 1)
+    for _ in range(5):  # more than the queue holds
+        writer.insert("t", [(1,)])
+    with pytest.raises(Exception):
+        writer.finish("t").result(timeout=5)
+    writer.close()
+
+
+def test_bulk_load_settings_do_not_outlive_the_load(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text("region,amount\nnorth,10\nsouth,20\n")
+    source = SQLiteUploadDataSource()
+    source.load_file(str(path))
+
+    with source._write_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() != -65536
+        assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 0
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from api.services.vector_index import MemmapVectorIndex
+
+
+def test_clear_keeps_live_views_readable(tmp_path):
+    index = MemmapVectorIndex(8, str(tmp_path), "test-model", "int8")
+    rng = np.random.default_rng(0)
+    index.add(rng.standard_normal((100, 8)), [f"chunk {i}" for i in range(100)], "a.txt")
+    # What a search running concurrently with clear() would be holding.
+    views = [index._matrix, index._codes, index._scales, index._offsets]
+    chunks_fd = index._chunks_fd
+
+    index.clear()
+
+    assert len(index) == 0
+    assert index.search(rng.standard_normal(8)) == []
+    # Reading the old mappings after clear() used to die with SIGBUS.
+    for view in views:
+        np.asarray(view).sum()
+    assert views[0].shape == (100, 8)
+    assert b"chunk" in os.pread(chunks_fd, 64, 0)
+
+    index.add(rng.standard_normal((3, 8)), ["x", "y", "z"], "b.txt")
+    assert {r["content"] for r in index.search(rng.standard_normal(8), top_k=3)} == {"x", "y", "z"}
+    reopened = MemmapVectorIndex(8, str(tmp_path), "test-model", "int8")
+    assert len(reopened) == 3